@@ -1,19 +1,592 @@
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
 import dash
 from dash import dcc, html, callback, Input
+from dash.exceptions import MissingCallbackContextException, PreventUpdate
+from flask import Response, g, request
+import numpy as np
+import plotly
 import plotly.graph_objs as go
 import pandas as pd
 
-# Load the processed sales data
-df = pd.read_csv('data/processed_sales_data.csv')
+from metrics import MetricsRegistry, SIZE_BUCKETS
+from process_sales_data import file_sha256
+from profiling import DEFAULT_PROFILE_DIR, install_request_profiler
+
+# pyarrow is optional: without it the dashboard always reads the CSV
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = feather = None
+
+# diskcache is optional: it backs the background callback manager (pip install "dash[diskcache]")
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+# brotli is optional: without it responses are only gzip-compressed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DATA_PATH = 'data/processed_sales_data.csv'
+
+# Directory for Arrow IPC copies of the prepared (parsed, typed, sorted) data,
+# keyed on the source file's hash and mtime ('' disables the cache)
+FRAME_CACHE_DIR = os.environ.get('SALES_FRAME_CACHE_DIR', 'cache/frames')
+
+# Default-view chart responses written by prerender.py after each ETL run
+PRERENDER_DIR = os.environ.get('SALES_PRERENDER_DIR', 'data/prerendered')
+
+# Responses of these types and at least this size are compressed for clients that accept it
+COMPRESS_MIMETYPES = frozenset({'application/json', 'application/javascript', 'text/javascript',
+                                'text/css', 'text/html', 'text/plain'})
+COMPRESS_MIN_BYTES = 1024
+
+# Compression levels on the request path; prerender.py can afford the maximum
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Compressed component suite files kept in memory (one entry per URL and content coding)
+ASSET_CACHE_SIZE = 128
+
+# Product shown until the user picks another one
+DEFAULT_PRODUCT = 'pink morsel'
+
+# Fraction of callback requests to profile (0 disables), where to write the
+# artifacts and in which format ('pstats' or 'html', the latter needs pyinstrument)
+PROFILE_RATE = float(os.environ.get('SALES_PROFILE_RATE', '0'))
+PROFILE_DIR = os.environ.get('SALES_PROFILE_DIR', DEFAULT_PROFILE_DIR)
+PROFILE_FORMAT = os.environ.get('SALES_PROFILE_FORMAT', 'pstats')
+
+# Seconds between checks for a new ETL output (0 disables the background watcher)
+RELOAD_INTERVAL = float(os.environ.get('SALES_DATA_RELOAD_INTERVAL', '0'))
+# gunicorn.conf.py sets this so the watcher runs in each worker rather than in the master
+RELOAD_WATCHER_IN_WORKERS = os.environ.get('SALES_RELOAD_WATCHER_IN_WORKERS', '0') not in ('', '0')
+
+# Load the data at import instead of on first use
+DATA_PRELOAD = os.environ.get('SALES_DATA_PRELOAD', '0') not in ('', '0')
+
+# Run update_chart as a background callback in worker processes instead of the
+# request thread, with job results and progress kept in a local diskcache directory
+BACKGROUND_CALLBACKS = os.environ.get('SALES_BACKGROUND_CALLBACKS', '0') not in ('', '0')
+BACKGROUND_CACHE_DIR = os.environ.get('SALES_BACKGROUND_CACHE_DIR', 'cache/callbacks')
+
+# Seconds an unused background result stays on disk
+BACKGROUND_RESULT_EXPIRE = 3600
+
+# Traces longer than this are downsampled (roughly one point per pixel of chart width)
+MAX_POINTS_PER_TRACE = 2000
+
+# Switch to WebGL (Scattergl) traces once the selected rows exceed this count
+WEBGL_THRESHOLD = 10000
+
+# Chart time buckets and their pandas period frequencies (daily plots the raw rows)
+GRANULARITIES = {'daily': None, 'weekly': 'W', 'monthly': 'M'}
+
+# Maximum number of (region, data version) results kept by the figure cache
+FIGURE_CACHE_SIZE = 32
+
+# update_chart phases, reported as progress while a background callback runs
+CHART_PHASES = ('select', 'figure', 'summary')
+
+
+def find_columnar_copy(csv_path):
+    """Return the Feather/Parquet copy written by process_sales_data.py if it is usable"""
+    if feather is None:
+        return None
+    root, _ = os.path.splitext(csv_path)
+    for path in (f'{root}.feather', f'{root}.parquet'):
+        # Ignore copies older than the CSV (left over from a previous run)
+        if os.path.exists(path) and (not os.path.exists(csv_path)
+                                     or os.path.getmtime(path) >= os.path.getmtime(csv_path)):
+            return path
+    return None
+
+
+def prepare_sales_data(csv_path=DATA_PATH):
+    """Parse the processed sales data into typed columns sorted by date"""
+    columnar_path = find_columnar_copy(csv_path)
+    if columnar_path is None:
+        df = pd.read_csv(csv_path, dtype={'Region': 'category', 'Product': 'category'})
+        # Convert Date column to datetime
+        df['Date'] = pd.to_datetime(df['Date'])
+    elif columnar_path.endswith('.feather'):
+        # Dates, categories and floats are already typed, so no parsing is needed
+        df = feather.read_table(columnar_path, memory_map=True).to_pandas()
+    else:
+        df = pd.read_parquet(columnar_path)
+
+    # Output from before the ETL kept every product only has Pink Morsels
+    if 'Product' not in df.columns:
+        df['Product'] = DEFAULT_PRODUCT
+
+    # Sort by date
+    return df.sort_values('Date')
+
+
+def frame_cache_path(csv_path, cache_dir=FRAME_CACHE_DIR):
+    """Cache file for the prepared data, e.g. cache/frames/processed_sales_data-<source>-<sha256>-<mtime>.arrow
+
+    <source> hashes the absolute source path, so sources with the same file
+    name in different directories get their own caches.
+    """
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    source = hashlib.sha256(os.path.abspath(csv_path).encode()).hexdigest()[:8]
+    key = f'{file_sha256(csv_path)[:16]}-{os.stat(csv_path).st_mtime_ns:x}'
+    return os.path.join(cache_dir, f'{stem}-{source}-{key}.arrow')
+
+
+def write_frame_cache(df, cache_path):
+    """Write the prepared data as uncompressed Arrow IPC and drop older caches of the same source"""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Write then rename, so a concurrent reader never maps a half-written file
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, cache_path)
+    source = os.path.basename(cache_path).rsplit('-', 2)[0]
+    for stale in glob.glob(os.path.join(os.path.dirname(cache_path), f'{glob.escape(source)}-*-*.arrow')):
+        if stale != cache_path:
+            os.remove(stale)
+
+
+def load_sales_data(csv_path=DATA_PATH, cache_dir=FRAME_CACHE_DIR):
+    """Load the processed sales data sorted by date
+
+    With pyarrow installed, the prepared frame is cached on disk and later
+    loads memory-map it instead of parsing. The cache key changes whenever
+    the source file does, so edits rebuild it.
+    """
+    if feather is None or not cache_dir or not os.path.exists(csv_path):
+        return prepare_sales_data(csv_path)
+
+    cache_path = frame_cache_path(csv_path, cache_dir)
+    if os.path.exists(cache_path):
+        try:
+            # Types, categories, sort order and index are stored, so nothing is parsed
+            return feather.read_table(cache_path, memory_map=True).to_pandas(split_blocks=True)
+        except (OSError, pa.ArrowInvalid):
+            # Unreadable cache (e.g. truncated by a full disk): rebuild it below
+            pass
+
+    df = prepare_sales_data(csv_path)
+    try:
+        write_frame_cache(df, cache_path)
+    except OSError:
+        # A read-only or full cache directory only costs the next start a parse
+        pass
+    return df
+
+
+def dataset_version(csv_path=DATA_PATH):
+    """Version stamp of the file load_sales_data reads, from its size and mtime"""
+    stat = os.stat(find_columnar_copy(csv_path) or csv_path)
+    return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+
+class FigureCache:
+    """Thread-safe LRU cache for update_chart results
+
+    Keys carry the dataset version, and entries from older versions are
+    dropped as soon as a newer version is requested, so reloading the data
+    invalidates the cache without any explicit call.
+    """
+
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, version, build):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Build outside the lock so slow misses don't block cache hits
+        result = build()
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = result
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries),
+                    'maxsize': self.maxsize, 'version': self._version}
+
+
+# Price increase date
+PRICE_INCREASE_DATE = pd.to_datetime('2021-01-15')
+
+
+def summarize_sales(data):
+    """Before/after price increase totals and average daily sales"""
+    before = data['Date'] < PRICE_INCREASE_DATE
+    return {
+        'before_total': data['Sales'][before].sum(),
+        'after_total': data['Sales'][~before].sum(),
+        'before_avg': data['Sales'][before].mean(),
+        'after_avg': data['Sales'][~before].mean()
+    }
+
+
+def build_region_index(df):
+    """Precompute the per-region series and summary stats used by update_chart
+
+    Returns (region_series, region_stats): region_series maps each region to
+    its date-sorted rows, region_stats maps 'all' and each region to the
+    output of summarize_sales. Callbacks then only do dictionary lookups.
+    """
+    region_series = {
+        region: data.sort_values('Date')
+        for region, data in df.groupby('Region', sort=True, observed=True)
+    }
+    region_stats = {'all': summarize_sales(df)}
+    for region, data in region_series.items():
+        region_stats[region] = summarize_sales(data)
+    return region_series, region_stats
+
+
+def rollup_series(data, freq):
+    """Total Sales per period of a date-sorted series
+
+    A bucket that straddles the price increase is split at it, so rollups
+    never mix sales from before and after the change.
+    """
+    bucket = data['Date'].dt.to_period(freq).dt.start_time
+    bucket = bucket.mask((data['Date'] >= PRICE_INCREASE_DATE) & (bucket < PRICE_INCREASE_DATE), PRICE_INCREASE_DATE)
+    return data['Sales'].groupby(bucket.rename('Date')).sum().reset_index()
+
+
+def build_rollups(region_series):
+    """Weekly and monthly rollups of every region, keyed by granularity then region"""
+    return {
+        granularity: {region: rollup_series(rows, freq) for region, rows in region_series.items()}
+        for granularity, freq in GRANULARITIES.items() if freq is not None
+    }
+
+
+def build_prefix_index(df, region_series):
+    """Sorted date keys and prefix sums of Sales for 'all' and each region
+
+    With these, the sum and count of any date window are two binary searches
+    and two subtractions, so windowed stats cost O(log N) per request.
+    """
+    prefix_index = {}
+    for key, data in [('all', df), *region_series.items()]:
+        dates = data['Date'].to_numpy()
+        cumulative = np.concatenate(([0.0], np.cumsum(data['Sales'].to_numpy(dtype=float))))
+        prefix_index[key] = (dates, cumulative)
+    return prefix_index
+
+
+def summarize_window(prefix, window):
+    """Same numbers as summarize_sales, restricted to a (start, end) date window, from prefix sums"""
+    dates, cumulative = prefix
+    lo = int(np.searchsorted(dates, window[0].to_datetime64(), side='left'))
+    # A reversed window (start after end) is empty rather than a negative span
+    hi = max(int(np.searchsorted(dates, window[1].to_datetime64(), side='right')), lo)
+    split = min(max(int(np.searchsorted(dates, PRICE_INCREASE_DATE.to_datetime64(), side='left')), lo), hi)
 
-# Convert Date column to datetime
-df['Date'] = pd.to_datetime(df['Date'])
+    before_total = cumulative[split] - cumulative[lo]
+    after_total = cumulative[hi] - cumulative[split]
+    return {
+        'before_total': before_total,
+        'after_total': after_total,
+        'before_avg': before_total / (split - lo) if split > lo else np.nan,
+        'after_avg': after_total / (hi - split) if hi > split else np.nan
+    }
+
+
+def clamped_timestamp(value):
+    """pd.Timestamp of a date string, clamped to the nanosecond range of the Date column (1677-2262)"""
+    # Whole microseconds, so Plotly can turn the bounds into datetimes without dropping nanoseconds
+    return min(max(pd.Timestamp(value), pd.Timestamp.min.ceil('us')), pd.Timestamp.max.floor('us'))
+
+
+def selected_window(start_date, end_date):
+    """(start, end) from the date-range picker, with open ends filled in, or None for all dates"""
+    if not start_date and not end_date:
+        return None
+    start = clamped_timestamp(start_date) if start_date else pd.Timestamp.min
+    end = clamped_timestamp(end_date) if end_date else pd.Timestamp.max
+    return start, end
+
+
+def slice_window(data, window):
+    """Rows of a date-sorted series with start <= Date <= end (binary search, no mask)"""
+    if window is None:
+        return data
+    lo = int(data['Date'].searchsorted(window[0], side='left'))
+    hi = int(data['Date'].searchsorted(window[1], side='right'))
+    return data.iloc[lo:hi]
+
+
+def slice_rollup(rollup, prefix, window):
+    """Buckets of a rollup that overlap a window, with the edge buckets clipped to it
+
+    Buckets entirely inside the window keep their precomputed totals. The first
+    and last ones are re-summed over their part of the window from the prefix
+    sums, so the plotted totals agree with summarize_window.
+    """
+    if window is None or rollup.empty:
+        return rollup
+    starts = rollup['Date'].to_numpy()
+    window_start, window_end = window[0].to_datetime64(), window[1].to_datetime64()
+    # The bucket holding the window start may begin before it
+    first = max(int(np.searchsorted(starts, window_start, side='right')) - 1, 0)
+    last = int(np.searchsorted(starts, window_end, side='right'))
+    if last <= first:
+        return rollup.iloc[0:0]
+
+    dates, cumulative = prefix
+    bucket_dates = starts[first:last].copy()
+    sales = rollup['Sales'].to_numpy(dtype=float)[first:last].copy()
+    keep = np.ones(len(sales), dtype=bool)
+    for i in {0, len(sales) - 1}:
+        # A bucket runs up to the next bucket's start (the next rollup row begins there)
+        lo = int(np.searchsorted(dates, max(bucket_dates[i], window_start), side='left'))
+        hi = int(np.searchsorted(dates, window_end, side='right'))
+        if first + i + 1 < len(starts):
+            hi = min(hi, int(np.searchsorted(dates, starts[first + i + 1], side='left')))
+        sales[i] = cumulative[hi] - cumulative[lo] if hi > lo else 0.0
+        keep[i] = hi > lo
+        bucket_dates[i] = max(bucket_dates[i], window_start)
+    return pd.DataFrame({'Date': bucket_dates[keep], 'Sales': sales[keep]})
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of n_out points that keep the shape of (x, y)
+
+    The first and last points are always kept. Each middle bucket keeps the
+    point forming the largest triangle with the previously kept point and the
+    average of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(area.argmax())
+        indices[i + 1] = previous
+    return indices
+
+
+def downsample_series(data, max_points=MAX_POINTS_PER_TRACE):
+    """Reduce a date-sorted series to about max_points rows with LTTB
+
+    The series is split at the price increase and each side is downsampled
+    separately, so the last point before and the first point after the
+    boundary are always kept.
+    """
+    if len(data) <= max_points:
+        return data
+
+    split = int(data['Date'].searchsorted(PRICE_INCREASE_DATE))
+    x = data['Date'].to_numpy().astype('int64').astype(float)
+    y = data['Sales'].to_numpy(dtype=float)
+    parts = []
+    for lo, hi in ((0, split), (split, len(data))):
+        if hi > lo:
+            n_out = max(3, round(max_points * (hi - lo) / len(data)))
+            parts.append(lo + lttb_indices(x[lo:hi], y[lo:hi], n_out))
+    return data.iloc[np.concatenate(parts)]
+
+
+def scatter_trace_type(row_count, threshold=None):
+    """go.Scattergl for large selections (SVG rendering stalls there), go.Scatter otherwise"""
+    if threshold is None:
+        threshold = WEBGL_THRESHOLD
+    return go.Scattergl if row_count > threshold else go.Scatter
+
+
+def visible_x_range(relayout_data):
+    """(start, end) of a zoomed x axis from the graph's relayoutData, or None for the full view"""
+    if not relayout_data:
+        return None
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        bounds = relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    elif 'xaxis.range' in relayout_data:
+        bounds = relayout_data['xaxis.range']
+    else:
+        return None
+    # Zooming far out can report years pandas can't hold, which clamp to its limits
+    return clamped_timestamp(bounds[0]), clamped_timestamp(bounds[1])
+
+
+def clip_to_range(data, x_range):
+    """Rows of a date-sorted series inside x_range, plus one neighbour on each side"""
+    if x_range is None:
+        return data
+    lo = int(data['Date'].searchsorted(x_range[0]))
+    hi = int(data['Date'].searchsorted(x_range[1], side='right'))
+    return data.iloc[max(lo - 1, 0):hi + 1]
+
+
+class ProductIndex:
+    """Derived indexes for one product's rows: region series, stats, prefix sums and rollups"""
+
+    def __init__(self, df):
+        self.df = df
+        self.region_series, self.region_stats = build_region_index(df)
+        self.prefix_index = build_prefix_index(df, self.region_series)
+        self.rollups = build_rollups(self.region_series)
+
+    def series_for(self, granularity):
+        """Per-region series to plot at a granularity (raw daily rows by default)"""
+        return self.rollups.get(granularity, self.region_series)
+
+
+class SalesDataset:
+    """Snapshot of the loaded data with a ProductIndex per product
+
+    Snapshots are never modified after construction. Reloading builds a new
+    one and swaps the module-level reference, so a callback that reads the
+    reference once sees consistent data for its whole run.
+    """
+
+    def __init__(self, df, version):
+        self.df = df
+        self.version = version
+        self.loaded_at = time.time()
+        self.products = {
+            product: ProductIndex(rows)
+            for product, rows in df.groupby('Product', sort=True, observed=True)
+        }
+        self._missing = ProductIndex(df.iloc[0:0])
 
-# Sort by date
-df = df.sort_values('Date')
+    def product(self, name=DEFAULT_PRODUCT):
+        """Index for a product (an empty one if the data has no such product)"""
+        return self.products.get(name, self._missing)
+
+
+def load_dataset(csv_path=DATA_PATH):
+    # Stamp the version first: if the file changes mid-load the next check reloads again
+    version = dataset_version(csv_path)
+    return SalesDataset(load_sales_data(csv_path, FRAME_CACHE_DIR), version)
+
+
+_reload_lock = threading.Lock()
+
+
+def _reset_reload_lock():
+    # A forked child inherits the lock in whatever state another thread of the parent left it,
+    # and that thread doesn't exist in the child to release it
+    global _reload_lock
+    _reload_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_reload_lock)
+
+
+def get_dataset():
+    """Current data snapshot, loaded on first use rather than at import time"""
+    global dataset
+    if dataset is None:
+        with _reload_lock:
+            if dataset is None:
+                dataset = load_dataset()
+    return dataset
+
+
+def reload_dataset(csv_path=DATA_PATH, force=False):
+    """Load the data file again if its version changed and swap it in; returns the current snapshot"""
+    global dataset
+    with _reload_lock:
+        if force or dataset is None or dataset_version(csv_path) != dataset.version:
+            # Loading happens before the swap, so requests keep using the old snapshot meanwhile
+            dataset = load_dataset(csv_path)
+        return dataset
+
+
+def start_reload_watcher(interval=RELOAD_INTERVAL, csv_path=DATA_PATH):
+    """Poll the data file in a daemon thread and hot-swap new ETL output"""
+    def watch():
+        while True:
+            time.sleep(interval)
+            try:
+                reload_dataset(csv_path)
+            except Exception:
+                # Keep serving the previous snapshot (e.g. the ETL is mid-write)
+                app.server.logger.exception('Reloading %s failed', csv_path)
+
+    watcher = threading.Thread(target=watch, name='sales-data-reload', daemon=True)
+    watcher.start()
+    return watcher
+
+
+# The processed sales data is loaded lazily by get_dataset() (or preloaded,
+# see gunicorn.conf.py) so importing the app stays cheap
+dataset = None
+if DATA_PRELOAD:
+    get_dataset()
+figure_cache = FigureCache()
+
+# Hot-path instrumentation for update_chart, exposed on /metrics
+callback_metrics = MetricsRegistry()
+callback_metrics.describe('sales_callback_seconds', 'histogram', 'Total update_chart time, including cache hits')
+callback_metrics.describe('sales_callback_phase_seconds', 'histogram',
+                          'update_chart time per phase on cache misses (select, figure, summary)')
+callback_metrics.describe('sales_callback_response_bytes', 'histogram', 'Serialized callback response size')
+callback_metrics.describe('sales_prerendered_responses_total', 'counter',
+                          'Chart callbacks answered from prerender.py output, by status and content coding')
+
+
+
+def make_background_manager(enabled=BACKGROUND_CALLBACKS, cache_dir=BACKGROUND_CACHE_DIR):
+    """DiskcacheManager for background callbacks, or None to run them in the request thread"""
+    if not enabled:
+        return None
+    if diskcache is None:
+        raise RuntimeError('Background callbacks need diskcache (pip install "dash[diskcache]")')
+    # Results are keyed on the data version as well as the inputs, so a reload never serves stale figures
+    return dash.DiskcacheManager(diskcache.Cache(cache_dir), cache_by=[lambda: get_dataset().version],
+                                 expire=BACKGROUND_RESULT_EXPIRE)
+
+
+background_manager = make_background_manager()
 
 # Create the Dash app
 app = dash.Dash(__name__)
+server = app.server
 
 # Define custom styles
 colors = {
@@ -27,19 +600,26 @@ colors = {
     'border': '#e0e0e0'
 }
 
+def product_label(product):
+    return product.title()
+
+
 # Define the app layout
 app.layout = html.Div([
+    # Fires the product-options callback on page load
+    dcc.Location(id='url'),
+
     # Header
     html.Div([
         html.Div([
-            html.H1('Pink Morsel Sales Analysis', style={
+            html.H1(f'{product_label(DEFAULT_PRODUCT)} Sales Analysis', id='page-title', style={
                 'textAlign': 'center',
                 'color': colors['primary'],
                 'marginBottom': '10px',
                 'fontSize': '2.5em',
                 'fontWeight': 'bold'
             }),
-            html.P('Visualizing sales trends to answer: Were sales higher before or after the Pink Morsel price increase on January 15, 2021?', 
+            html.P('Visualizing sales trends to answer: Were sales higher before or after the price increase on January 15, 2021?', 
                 style={
                     'textAlign': 'center',
                     'fontSize': '16px',
@@ -61,6 +641,27 @@ app.layout = html.Div([
     html.Div([
         # Filters section
         html.Div([
+            html.Div([
+                html.H3('Product:', style={
+                    'color': colors['text_dark'],
+                    'marginBottom': '15px',
+                    'fontSize': '1.1em',
+                    'fontWeight': '600'
+                }),
+                dcc.Dropdown(
+                    id='product-selector',
+                    options=[{'label': product_label(DEFAULT_PRODUCT), 'value': DEFAULT_PRODUCT}],
+                    value=DEFAULT_PRODUCT,
+                    clearable=False
+                )
+            ], style={
+                'backgroundColor': colors['card_bg'],
+                'padding': '20px',
+                'borderRadius': '8px',
+                'border': f'1px solid {colors["border"]}',
+                'marginBottom': '20px',
+                'boxShadow': '0 1px 3px rgba(0,0,0,0.05)'
+            }),
             html.Div([
                 html.H3('Filter by Region:', style={
                     'color': colors['text_dark'],
@@ -97,6 +698,64 @@ app.layout = html.Div([
                 'border': f'1px solid {colors["border"]}',
                 'marginBottom': '20px',
                 'boxShadow': '0 1px 3px rgba(0,0,0,0.05)'
+            }),
+            html.Div([
+                html.H3('Filter by Date Range:', style={
+                    'color': colors['text_dark'],
+                    'marginBottom': '15px',
+                    'fontSize': '1.1em',
+                    'fontWeight': '600'
+                }),
+                dcc.DatePickerRange(
+                    id='date-range',
+                    display_format='YYYY-MM-DD',
+                    start_date_placeholder_text='Start date',
+                    end_date_placeholder_text='End date',
+                    initial_visible_month=PRICE_INCREASE_DATE.date(),
+                    clearable=True
+                )
+            ], style={
+                'backgroundColor': colors['card_bg'],
+                'padding': '20px',
+                'borderRadius': '8px',
+                'border': f'1px solid {colors["border"]}',
+                'marginBottom': '20px',
+                'boxShadow': '0 1px 3px rgba(0,0,0,0.05)'
+            }),
+            html.Div([
+                html.H3('Granularity:', style={
+                    'color': colors['text_dark'],
+                    'marginBottom': '15px',
+                    'fontSize': '1.1em',
+                    'fontWeight': '600'
+                }),
+                dcc.RadioItems(
+                    id='granularity-selector',
+                    options=[
+                        {'label': ' Daily', 'value': 'daily'},
+                        {'label': ' Weekly', 'value': 'weekly'},
+                        {'label': ' Monthly', 'value': 'monthly'}
+                    ],
+                    value='daily',
+                    inline=True,
+                    style={
+                        'display': 'flex',
+                        'gap': '20px'
+                    },
+                    labelStyle={
+                        'display': 'inline-block',
+                        'marginRight': '0px',
+                        'cursor': 'pointer',
+                        'color': colors['text_dark']
+                    }
+                )
+            ], style={
+                'backgroundColor': colors['card_bg'],
+                'padding': '20px',
+                'borderRadius': '8px',
+                'border': f'1px solid {colors["border"]}',
+                'marginBottom': '20px',
+                'boxShadow': '0 1px 3px rgba(0,0,0,0.05)'
             })
         ], style={
             'maxWidth': '1200px',
@@ -110,7 +769,13 @@ app.layout = html.Div([
                 'border': f'1px solid {colors["border"]}',
                 'borderRadius': '8px',
                 'overflow': 'hidden'
-            })
+            }),
+            # Shown only while a background callback is computing the chart
+            html.Div([
+                html.Progress(id='chart-progress', value='0', max=str(len(CHART_PHASES)),
+                              style={'width': '200px', 'marginRight': '10px'}),
+                html.Button('Cancel', id='cancel-chart', n_clicks=0)
+            ], id='chart-progress-bar', style={'display': 'none'})
         ], style={
             'backgroundColor': colors['card_bg'],
             'padding': '20px',
@@ -136,27 +801,119 @@ app.layout = html.Div([
     'minHeight': '100vh'
 })
 
+
+def triggered_by(component_id):
+    """Whether the running callback was triggered by component_id; False outside a callback"""
+    try:
+        return dash.ctx.triggered_id == component_id
+    except MissingCallbackContextException:
+        return False
+
+
 # Callback to update the chart
-@app.callback(
-    [dash.Output('sales-chart', 'figure'),
-     dash.Output('summary-stats', 'children')],
-    [Input('region-selector', 'value')]
-)
-def update_chart(selected_region):
-    # Filter data by region
+def update_chart(selected_region, relayout_data=None, start_date=None, end_date=None, granularity='daily',
+                 product=DEFAULT_PRODUCT, progress=None):
+    x_range = visible_x_range(relayout_data)
+    window = selected_window(start_date, end_date)
+
+    # Relayout events that don't move the x axis (autosize, y zoom, drag mode) keep the current figure.
+    # Direct calls (benchmarks, tests) have no callback context and always get a figure.
+    if x_range is None and relayout_data and 'xaxis.autorange' not in relayout_data:
+        if triggered_by('sales-chart'):
+            raise PreventUpdate
+
+    # Take one snapshot so a concurrent reload can't mix old and new data
+    data = get_dataset()
+
+    # Repeat selections are served from the cache without touching Plotly
+    start = time.perf_counter()
+    result = figure_cache.get_or_build((product, selected_region, x_range, window, granularity), data.version,
+                                       lambda: build_chart(selected_region, x_range, data, window, granularity,
+                                                           product, progress))
+    callback_metrics.observe('sales_callback_seconds', time.perf_counter() - start)
+    return result
+
+
+def update_chart_in_background(set_progress, *args):
+    # Dash passes the progress setter first; it fills the chart-progress value and max
+    return update_chart(*args, progress=lambda done, total: set_progress((str(done), str(total))))
+
+
+chart_outputs = [dash.Output('sales-chart', 'figure'), dash.Output('summary-stats', 'children')]
+chart_inputs = [Input('region-selector', 'value'),
+                Input('sales-chart', 'relayoutData'),
+                Input('date-range', 'start_date'),
+                Input('date-range', 'end_date'),
+                Input('granularity-selector', 'value'),
+                Input('product-selector', 'value')]
+
+if background_manager is None:
+    app.callback(chart_outputs, chart_inputs)(update_chart)
+else:
+    # A new selection cancels the job it supersedes (Dash terminates the old job), as does the Cancel button
+    app.callback(
+        chart_outputs, chart_inputs,
+        background=True,
+        manager=background_manager,
+        progress=[dash.Output('chart-progress', 'value'), dash.Output('chart-progress', 'max')],
+        progress_default=['0', str(len(CHART_PHASES))],
+        running=[(dash.Output('chart-progress-bar', 'style'), {'display': 'flex', 'alignItems': 'center',
+                                                               'marginTop': '10px'}, {'display': 'none'})],
+        cancel=[Input('cancel-chart', 'n_clicks')],
+        # Poll for progress and results every 250 ms (Dash defaults to once a second)
+        interval=250
+    )(update_chart_in_background)
+
+
+def finish_phase(phase, seconds, progress=None):
+    callback_metrics.observe('sales_callback_phase_seconds', seconds, phase=phase)
+    if progress is not None:
+        progress(CHART_PHASES.index(phase) + 1, len(CHART_PHASES))
+
+
+def build_chart(selected_region, x_range=None, data=None, window=None, granularity='daily', product=DEFAULT_PRODUCT,
+                progress=None):
+    started = time.perf_counter()
+    if data is None:
+        data = get_dataset()
+    # Constant-time lookup of the product's precomputed indexes
+    index = data.product(product)
+    empty = index.df.iloc[0:0]
+    series = index.series_for(granularity)
+
+    # Look up precomputed data for the region
     if selected_region == 'all':
-        filtered_df = df
         title_suffix = ' - All Regions'
     else:
-        filtered_df = df[df['Region'] == selected_region]
         title_suffix = f' - {selected_region.capitalize()}'
+    period_label = granularity.capitalize() if granularity in GRANULARITIES else 'Daily'
+    if window is None:
+        stats = index.region_stats.get(selected_region) or summarize_sales(empty)
+    elif selected_region in index.prefix_index:
+        stats = summarize_window(index.prefix_index[selected_region], window)
+    else:
+        stats = summarize_sales(empty)
     
+    def windowed(region, rows):
+        if granularity in index.rollups and region in index.prefix_index:
+            return slice_rollup(rows, index.prefix_index[region], window)
+        return slice_window(rows, window)
+
+    # Full resolution inside a zoomed range, downsampled otherwise
+    if selected_region == 'all':
+        selected = {region: clip_to_range(windowed(region, rows), x_range) for region, rows in series.items()}
+    else:
+        selected = {selected_region: clip_to_range(windowed(selected_region, series.get(selected_region, empty)),
+                                                   x_range)}
+    trace_type = scatter_trace_type(sum(len(rows) for rows in selected.values()))
+    selected = {region: downsample_series(rows) for region, rows in selected.items()}
+
+    selected_at = time.perf_counter()
+    finish_phase('select', selected_at - started, progress)
+
     # Create line chart
     fig = go.Figure()
     
-    # Price increase date
-    price_increase_date = pd.to_datetime('2021-01-15')
-    
     # Define region colors
     region_colors = {
         'north': '#FF6B6B',
@@ -167,9 +924,8 @@ def update_chart(selected_region):
     
     if selected_region == 'all':
         # Add traces for each region
-        for region in sorted(df['Region'].unique()):
-            region_data = df[df['Region'] == region].sort_values('Date')
-            fig.add_trace(go.Scatter(
+        for region, region_data in selected.items():
+            fig.add_trace(trace_type(
                 x=region_data['Date'],
                 y=region_data['Sales'],
                 mode='lines+markers',
@@ -183,8 +939,8 @@ def update_chart(selected_region):
             ))
     else:
         # Add single trace for selected region
-        region_data = filtered_df.sort_values('Date')
-        fig.add_trace(go.Scatter(
+        region_data = selected[selected_region]
+        fig.add_trace(trace_type(
             x=region_data['Date'],
             y=region_data['Sales'],
             mode='lines+markers',
@@ -198,8 +954,9 @@ def update_chart(selected_region):
         ))
     
     # Add vertical line at price increase date
+    # Plotly can't place the annotation on a Timestamp, so pass epoch milliseconds
     fig.add_vline(
-        x=price_increase_date,
+        x=PRICE_INCREASE_DATE.timestamp() * 1000,
         line_dash="dash",
         line_color=colors['primary'],
         line_width=2,
@@ -212,7 +969,7 @@ def update_chart(selected_region):
     # Update layout with improved styling
     fig.update_layout(
         title={
-            'text': f'Daily Pink Morsel Sales{title_suffix}',
+            'text': f'{period_label} {product_label(product)} Sales{title_suffix}',
             'x': 0.5,
             'xanchor': 'center',
             'font': {'size': 20, 'color': colors['text_dark']}
@@ -249,14 +1006,19 @@ def update_chart(selected_region):
             borderwidth=1
         )
     )
+
+    # Keep the user's zoom when the figure is rebuilt for a zoomed range
+    if x_range is not None:
+        fig.update_xaxes(range=list(x_range))
+
+    figure_at = time.perf_counter()
+    finish_phase('figure', figure_at - selected_at, progress)
     
-    # Calculate summary statistics
-    before_price_increase = filtered_df[filtered_df['Date'] < price_increase_date]['Sales'].sum()
-    after_price_increase = filtered_df[filtered_df['Date'] >= price_increase_date]['Sales'].sum()
-    
-    # Calculate average daily sales
-    before_avg = filtered_df[filtered_df['Date'] < price_increase_date]['Sales'].mean()
-    after_avg = filtered_df[filtered_df['Date'] >= price_increase_date]['Sales'].mean()
+    # Summary statistics (precomputed at load time)
+    before_price_increase = stats['before_total']
+    after_price_increase = stats['after_total']
+    before_avg = stats['before_avg']
+    after_avg = stats['after_avg']
     
     # Determine if sales increased or decreased
     change_percent = ((after_avg - before_avg) / before_avg) * 100 if before_avg > 0 else 0
@@ -372,7 +1134,281 @@ def update_chart(selected_region):
         'border': f'1px solid {colors["border"]}'
     })
     
+    finish_phase('summary', time.perf_counter() - figure_at, progress)
     return fig, summary
 
+
+@app.server.route('/reload', methods=['POST'])
+def reload_data():
+    """Pick up a new ETL run without restarting the server"""
+    previous = get_dataset().version
+    current = reload_dataset()
+    return {'reloaded': current.version != previous, 'data_version': current.version, 'rows': len(current.df)}
+
+
+@app.callback(
+    dash.Output('product-selector', 'options'),
+    Input('url', 'pathname')
+)
+def update_product_options(_pathname):
+    # Products come from the loaded index, so new ones appear without re-ingestion
+    return [{'label': product_label(product), 'value': product} for product in get_dataset().products]
+
+
+@app.callback(
+    dash.Output('page-title', 'children'),
+    Input('product-selector', 'value')
+)
+def update_page_title(product):
+    return f'{product_label(product or DEFAULT_PRODUCT)} Sales Analysis'
+
+
+def accepted_encoding(accept_encodings):
+    """Best content coding the client accepts: 'br', 'gzip' or None"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_body(body, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY if level is None else level)
+    # mtime=0 keeps the output (and so its ETag) identical for identical input
+    return gzip.compress(body, GZIP_LEVEL if level is None else level, mtime=0)
+
+
+class AssetCache:
+    """Thread-safe LRU cache of compressed component suite bodies
+
+    Component suites (Dash and Plotly JavaScript) are the same for every
+    visitor and only change with a Dash upgrade, which restarts the server,
+    so entries never expire; the size bound only guards against many URLs.
+    """
+
+    def __init__(self, maxsize=ASSET_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compress(self, key, body, encoding):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        compressed = compress_body(body, encoding)
+        with self._lock:
+            self._entries[key] = compressed
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return compressed
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+compressed_assets = AssetCache()
+
+
+@app.server.after_request
+def add_validators(response):
+    # Layout and callback graph only change with a deploy, so browsers can revalidate them with ETags.
+    # Runs after compress_response, so each content coding gets its own strong ETag
+    if request.method == 'GET' and response.status_code == 200 and \
+            request.path.endswith(('/_dash-layout', '/_dash-dependencies')):
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        response.make_conditional(request)
+    return response
+
+
+@app.server.after_request
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = accepted_encoding(request.accept_encodings)
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    if request.path.startswith('/_dash-component-suites/'):
+        compressed = compressed_assets.get_or_compress((request.full_path, encoding), body, encoding)
+    else:
+        compressed = compress_body(body, encoding)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    # A strong ETag must differ between content codings of the same resource
+    tag, weak = response.get_etag()
+    if tag:
+        response.set_etag(f'{tag}-{encoding}', weak)
+    return response
+
+
+# Flask runs after_request hooks in reverse order of registration, so this one, registered last,
+# sees callback responses before they are compressed
+@app.server.after_request
+def record_response_size(response):
+    # Callback responses are already serialized, so their length is known without extra work.
+    # Prerendered bodies and 304s were not built by the callback and are counted separately
+    if (request.path.endswith('/_dash-update-component') and response.status_code == 200
+            and not g.get('prerendered') and response.content_length is not None):
+        callback_metrics.observe('sales_callback_response_bytes', response.content_length, SIZE_BUCKETS)
+    return response
+
+
+# The chart callback's inputs when only the region differs from the page defaults
+PRERENDERED_INPUTS = {
+    ('sales-chart', 'relayoutData'): None,
+    ('date-range', 'start_date'): None,
+    ('date-range', 'end_date'): None,
+    ('granularity-selector', 'value'): 'daily',
+    ('product-selector', 'value'): DEFAULT_PRODUCT
+}
+CHART_CALLBACK_OUTPUT = '..sales-chart.figure...summary-stats.children..'
+
+
+def chart_callback_request(region, start_date=None, end_date=None):
+    """Request body the browser sends to /_dash-update-component when the region changes"""
+    values = dict(PRERENDERED_INPUTS)
+    values['region-selector', 'value'] = region
+    values['date-range', 'start_date'] = start_date
+    values['date-range', 'end_date'] = end_date
+    return {
+        'output': CHART_CALLBACK_OUTPUT,
+        'outputs': [{'id': output.component_id, 'property': output.component_property}
+                    for output in chart_outputs],
+        'inputs': [{'id': item.component_id, 'property': item.component_property,
+                    'value': values[item.component_id, item.component_property]}
+                   for item in chart_inputs],
+        'changedPropIds': ['region-selector.value'],
+        'state': []
+    }
+
+# Prerendered bodies also depend on the code that built them: this module and the Dash/Plotly releases
+RENDER_VERSION = f"{file_sha256(os.path.abspath(__file__))[:16]}-dash{dash.__version__}-plotly{plotly.__version__}"
+
+_prerendered = None
+
+
+def load_prerendered(directory=None):
+    """Manifest and bodies written by prerender.py (re-read only when the manifest changes)"""
+    global _prerendered
+    manifest_path = os.path.join(directory or PRERENDER_DIR, 'manifest.json')
+    try:
+        stat = os.stat(manifest_path)
+        stamp = (manifest_path, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+    if _prerendered is None or _prerendered[0] != stamp:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        bodies = {}
+        for region, entry in manifest['regions'].items():
+            for encoding, name in entry['files'].items():
+                with open(os.path.join(os.path.dirname(manifest_path), name), 'rb') as f:
+                    bodies[region, encoding] = f.read()
+        _prerendered = (stamp, manifest, bodies)
+    return _prerendered[1], _prerendered[2]
+
+
+def prerendered_region(body):
+    """Region of a chart callback request that leaves every other control at its default, else None"""
+    if not isinstance(body, dict) or body.get('output') != CHART_CALLBACK_OUTPUT:
+        return None
+    # The browser leaves out the value of inputs that were never set
+    values = {(item.get('id'), item.get('property')): item.get('value') for item in body.get('inputs', [])}
+    region = values.pop(('region-selector', 'value'), None)
+
+    # After its first render the graph reports relayoutData such as {'autosize': True}; any
+    # relayoutData that doesn't zoom the x axis gives the same full-range figure
+    relayout_data = values.pop(('sales-chart', 'relayoutData'), None)
+    try:
+        zoomed = visible_x_range(relayout_data) is not None
+    except (TypeError, ValueError):
+        return None
+    # update_chart skips non-zoom relayout events raised by the graph itself (except resets)
+    triggered_by_graph = 'sales-chart.relayoutData' in (body.get('changedPropIds') or [])
+    if zoomed or (triggered_by_graph and relayout_data and 'xaxis.autorange' not in relayout_data):
+        return None
+    expected = {key: value for key, value in PRERENDERED_INPUTS.items() if key != ('sales-chart', 'relayoutData')}
+    return region if values == expected else None
+
+
+@app.server.before_request
+def serve_prerendered():
+    # Background callbacks answer with a job id first, and no-cache asks for a freshly built response
+    if (request.method != 'POST' or not request.path.endswith('/_dash-update-component')
+            or background_manager is not None or request.cache_control.no_cache):
+        return None
+    try:
+        prerendered = load_prerendered()
+    except (OSError, ValueError, KeyError):
+        app.server.logger.exception('Ignoring unreadable prerendered responses in %s', PRERENDER_DIR)
+        return None
+    if prerendered is None:
+        return None
+    manifest, bodies = prerendered
+    region = prerendered_region(request.get_json(silent=True))
+    entry = manifest['regions'].get(region)
+    # Responses rendered from another data version or by other code are stale
+    if (entry is None or manifest['data_version'] != get_dataset().version
+            or manifest.get('render_version') != RENDER_VERSION):
+        return None
+
+    # Precompressed files don't need brotli installed here, only accepted by the client
+    encodings = [encoding for encoding in ('br', 'gzip')
+                 if encoding in entry['files'] and request.accept_encodings[encoding]]
+    encoding = encodings[0] if encodings else 'identity'
+    tag = entry['etag'] if encoding == 'identity' else f"{entry['etag']}-{encoding}"
+    g.prerendered = True
+    if request.if_none_match.contains(tag):
+        response = Response(status=304)
+    else:
+        response = Response(bodies[region, encoding], mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(tag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    callback_metrics.inc('sales_prerendered_responses_total', status=response.status_code, encoding=encoding)
+    return response
+
+
+@app.server.route('/metrics')
+def metrics():
+    """Prometheus text exposition of callback latency, response size and cache counters"""
+    cache = figure_cache.stats()
+    samples = [
+        ('sales_figure_cache_hits_total', 'counter', 'update_chart results served from the cache', cache['hits']),
+        ('sales_figure_cache_misses_total', 'counter', 'update_chart results built from scratch', cache['misses']),
+        ('sales_figure_cache_entries', 'gauge', 'Entries currently held by the figure cache', cache['size'])
+    ]
+    if dataset is not None:
+        samples.append(('sales_data_rows', 'gauge', 'Rows in the loaded sales dataset', len(dataset.df)))
+    return callback_metrics.render(samples), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+@app.server.route('/health')
+def health():
+    data = get_dataset()
+    return {'status': 'ok', 'data_version': data.version, 'rows': len(data.df),
+            'loaded_at': data.loaded_at, 'figure_cache': figure_cache.stats()}
+
+
+if PROFILE_RATE > 0:
+    install_request_profiler(app.server, PROFILE_RATE, PROFILE_DIR, PROFILE_FORMAT)
+
+# Under gunicorn the watcher is started by each worker instead (see post_fork in gunicorn.conf.py),
+# so the preloading master never runs a thread that could hold _reload_lock while it forks
+if RELOAD_INTERVAL > 0 and not RELOAD_WATCHER_IN_WORKERS:
+    start_reload_watcher()
+    # Threads don't survive fork, so restart it in children
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=start_reload_watcher)
+
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    app.run(debug=True)
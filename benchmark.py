@@ -0,0 +1,386 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import process_sales_data
+
+# Same products and prices as the real daily files (pink morsel goes up to $5.00 on 2021-01-15)
+PRODUCTS = {
+    'chartreuse morsel': 3.00,
+    'gold morsel': 9.99,
+    'lapis morsel': 1.99,
+    'magenta morsel': 2.50,
+    'periwinkle morsel': 1.25,
+    'pink morsel': 3.00,
+    'vermilion morsel': 4.99
+}
+REGIONS = ['north', 'south', 'east', 'west']
+START_DATE = pd.Timestamp('2018-02-06')
+END_DATE = pd.Timestamp('2022-02-14')
+PRICE_INCREASE_DATE = pd.Timestamp('2021-01-15')
+
+# Rows generated per write when building synthetic inputs (bounds generator memory)
+GENERATOR_CHUNK_ROWS = 1_000_000
+
+# Slowdown against a baseline reported as a regression: over 10% and over 1 ms
+REGRESSION_THRESHOLD = 10.0
+REGRESSION_MIN_DELTA_MS = 1.0
+
+REGION_VALUES = ['all', 'north', 'south', 'east', 'west']
+
+ETL_MODES = ['in_memory', 'streaming', 'parallel', 'polars', 'duckdb']
+
+# Out-of-core engines are timed by default when they are installed
+DEFAULT_ETL_MODES = ['in_memory', 'streaming', 'parallel'] + [
+    engine for engine in ('polars', 'duckdb') if process_sales_data.engine_installed(engine)
+]
+
+
+def generate_raw_data(directory, rows, shards=3, seed=0):
+    """Write daily_sales_data_*.csv-shaped files with `rows` rows in total
+
+    Shards cover consecutive date ranges like the real files, and rows are
+    written in chunks so 10^8-row inputs don't need to fit in memory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    products = np.array(list(PRODUCTS))
+    base_prices = np.array(list(PRODUCTS.values()))
+    pink = list(PRODUCTS).index('pink morsel')
+    span_ns = END_DATE.value - START_DATE.value
+
+    files = []
+    for shard in range(shards):
+        path = os.path.join(directory, f'daily_sales_data_{shard}.csv')
+        shard_rows = rows // shards + (1 if shard < rows % shards else 0)
+        shard_start = START_DATE.value + span_ns * shard // shards
+        shard_span = span_ns // shards
+        written = 0
+        with open(path, 'w', newline='') as out:
+            out.write('product,price,quantity,date,region\n')
+            while written < shard_rows:
+                n = min(GENERATOR_CHUNK_ROWS, shard_rows - written)
+                # Evenly spaced dates keep each shard sorted by date
+                offsets = (np.arange(written, written + n) * shard_span) // max(shard_rows, 1)
+                dates = pd.to_datetime(shard_start + offsets).normalize()
+                product_idx = rng.integers(0, len(products), n)
+                prices = base_prices[product_idx]
+                prices[(product_idx == pink) & (dates >= PRICE_INCREASE_DATE)] = 5.00
+                pd.DataFrame({
+                    'product': products[product_idx],
+                    'price': pd.Series(prices).map('${:.2f}'.format),
+                    'quantity': rng.integers(500, 600, n),
+                    'date': dates.strftime('%Y-%m-%d'),
+                    'region': np.array(REGIONS)[rng.integers(0, len(REGIONS), n)]
+                }).to_csv(out, index=False, header=False)
+                written += n
+        files.append(path)
+    return files
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and its children, in MB"""
+    try:
+        import resource
+    except ImportError:
+        # Windows: psutil reports the peak working set
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2**20
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def run_etl_case(mode, data_files, output_path, workers, chunksize):
+    """Run one ETL mode (inside a fresh process so peak memory is per case)"""
+    start = time.perf_counter()
+    if mode in process_sales_data.ENGINES:
+        rows = process_sales_data.process_with_engine(mode, data_files, output_path)
+    elif mode == 'parallel':
+        rows = process_sales_data.process_parallel(data_files, output_path, workers)
+    elif mode == 'streaming':
+        rows = process_sales_data.process_streaming(data_files, output_path, chunksize)
+    else:
+        rows = process_sales_data.process_in_memory(data_files, output_path)
+    return time.perf_counter() - start, rows, peak_rss_mb()
+
+
+def benchmark_etl(data_files, work_dir, input_rows, workers, chunksize, modes):
+    results = {}
+    reference = None
+    for mode in modes:
+        output_path = os.path.join(work_dir, f'processed_{mode}.csv')
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            seconds, rows, peak = executor.submit(run_etl_case, mode, data_files, output_path,
+                                                  workers, chunksize).result()
+        # Every mode must write the same bytes as the first one timed
+        digest = process_sales_data.file_sha256(output_path)
+        reference = reference or digest
+        results[mode] = {
+            'seconds': seconds,
+            'input_rows_per_sec': input_rows / seconds if seconds else None,
+            'output_rows': rows,
+            'peak_rss_mb': peak,
+            'identical_output': digest == reference
+        }
+        note = '' if digest == reference else f'  ⚠ output differs from {modes[0]}'
+        print(f"✓ ETL {mode:<10} {seconds:8.2f}s  {input_rows / seconds:12,.0f} rows/s  peak {peak:8.1f} MB{note}")
+    return results
+
+
+def latency_summary(samples):
+    samples = sorted(samples)
+    return {
+        'calls': len(samples),
+        'p50_ms': statistics.median(samples) * 1000,
+        'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+        'calls_per_sec': len(samples) / sum(samples) if sum(samples) else None
+    }
+
+
+def benchmark_callbacks(processed_path, repeat):
+    """Time update_chart for every region value, uncached and cached"""
+    import app
+
+    data = app.SalesDataset(app.load_sales_data(processed_path, cache_dir=None), 'benchmark')
+    previous, app.dataset = app.dataset, data
+    results = {}
+    try:
+        for region in REGION_VALUES:
+            uncached = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                app.build_chart(region, None, data)
+                uncached.append(time.perf_counter() - start)
+
+            app.update_chart(region)
+            cached = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                app.update_chart(region)
+                cached.append(time.perf_counter() - start)
+
+            results[region] = {'uncached': latency_summary(uncached), 'cached': latency_summary(cached)}
+            print(f"✓ update_chart({region!r:<8}) p50 {results[region]['uncached']['p50_ms']:8.2f} ms  "
+                  f"p99 {results[region]['uncached']['p99_ms']:8.2f} ms  "
+                  f"cached p50 {results[region]['cached']['p50_ms']:.3f} ms")
+    finally:
+        app.dataset = previous
+    return results
+
+
+STARTUP_PROBE = '''
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+import benchmark
+import_rss = benchmark.peak_rss_mb()
+app.get_dataset()
+loaded = time.perf_counter()
+print(json.dumps({'import_seconds': imported - start, 'import_rss_mb': import_rss,
+                  'first_load_seconds': loaded - imported, 'loaded_rss_mb': benchmark.peak_rss_mb()}))
+'''
+
+
+def benchmark_startup():
+    """Fresh dashboard processes: import cost, then the first data load without and with the frame cache"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env.pop('SALES_DATA_PRELOAD', None)
+
+    def probe(cache_dir):
+        result = subprocess.run([sys.executable, '-c', STARTUP_PROBE, here], capture_output=True, text=True,
+                                check=True, cwd=here, env=dict(env, SALES_FRAME_CACHE_DIR=cache_dir))
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # The first run parses and writes the cache, the second memory-maps it
+        startup = probe(cache_dir)
+        startup['cached_load_seconds'] = probe(cache_dir)['first_load_seconds']
+    print(f"✓ Cold start: import {startup['import_seconds']:.3f}s ({startup['import_rss_mb']:.1f} MB), "
+          f"first data load {startup['first_load_seconds']:.3f}s ({startup['loaded_rss_mb']:.1f} MB), "
+          f"from frame cache {startup['cached_load_seconds']:.3f}s")
+    return startup
+
+
+def process_memory_mb(pid):
+    """Unique (USS) and proportional (PSS) memory of a process, in MB; PSS needs Linux"""
+    import psutil
+    info = psutil.Process(pid).memory_full_info()
+    pss = getattr(info, 'pss', None)
+    return {'uss_mb': info.uss / 2**20, 'pss_mb': pss / 2**20 if pss is not None else None}
+
+
+def settled_workers(master_pid, workers, timeout):
+    """Worker pids of a gunicorn master once all of them are up and their memory stopped growing"""
+    import psutil
+    deadline = time.monotonic() + timeout
+    previous = None
+    while time.monotonic() < deadline:
+        pids = [child.pid for child in psutil.Process(master_pid).children()]
+        sizes = [process_memory_mb(pid)['uss_mb'] for pid in pids] if len(pids) == workers else None
+        if sizes and previous and len(previous) == len(sizes) and \
+                all(abs(after - before) <= before * 0.01 for before, after in zip(previous, sizes)):
+            return pids
+        previous = sizes
+        time.sleep(0.5)
+    raise RuntimeError(f'gunicorn workers did not settle within {timeout}s')
+
+
+def benchmark_worker_memory(workers=2):
+    """USS/PSS of loaded gunicorn workers with the app and data preloaded in the master and without
+
+    PSS splits each shared page between the processes mapping it, so the sum
+    over the master and its workers is their real footprint; USS is the memory
+    that would be freed if that one process exited.
+    """
+    import loadtest
+    if not loadtest.gunicorn_available() or not sys.platform.startswith('linux'):
+        print("⚠ Skipping worker memory: needs gunicorn on Linux")
+        return None
+
+    results = {}
+    with tempfile.TemporaryFile(mode='w+') as log:
+        for name, preload in (('preload', '1'), ('no_preload', '0')):
+            # Every worker holds the data either way: inherited from the master or loaded at its own import
+            process, _ = loadtest.start_server(loadtest.free_port(), workers, 1, log,
+                                               {'GUNICORN_PRELOAD': preload, 'SALES_DATA_PRELOAD': '1'})
+            try:
+                pids = settled_workers(process.pid, workers, loadtest.SERVER_START_TIMEOUT)
+                per_worker = [process_memory_mb(pid) for pid in pids]
+                master = process_memory_mb(process.pid)
+            finally:
+                loadtest.stop_server(process)
+            results[name] = {
+                'workers': workers,
+                'worker_uss_mb': statistics.mean(worker['uss_mb'] for worker in per_worker),
+                'worker_pss_mb': statistics.mean(worker['pss_mb'] for worker in per_worker),
+                'total_pss_mb': master['pss_mb'] + sum(worker['pss_mb'] for worker in per_worker)
+            }
+            print(f"✓ gunicorn {workers} workers, {name.replace('_', ' ')}: per worker "
+                  f"USS {results[name]['worker_uss_mb']:.1f} MB, PSS {results[name]['worker_pss_mb']:.1f} MB; "
+                  f"total PSS with master {results[name]['total_pss_mb']:.1f} MB")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_to_baseline(results, baseline_path):
+    """Print timing changes against a saved baseline; returns the regressed metric names"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    pairs = []
+    for mode, values in results['etl'].items():
+        if mode in baseline.get('etl', {}):
+            pairs.append((f'etl.{mode}.ms', baseline['etl'][mode]['seconds'] * 1000, values['seconds'] * 1000))
+    for region, values in results['callbacks'].items():
+        for kind in ('uncached', 'cached'):
+            for metric in ('p50_ms', 'p99_ms'):
+                try:
+                    before = baseline['callbacks'][region][kind][metric]
+                except KeyError:
+                    continue
+                pairs.append((f'callbacks.{region}.{kind}.{metric}', before, values[kind][metric]))
+
+    for metric in ('import_seconds', 'first_load_seconds', 'cached_load_seconds'):
+        if metric in baseline.get('startup', {}) and 'startup' in results:
+            pairs.append((f'startup.{metric[:-8]}.ms', baseline['startup'][metric] * 1000,
+                          results['startup'][metric] * 1000))
+
+    regressions = []
+    print(f"\nComparison with {baseline_path} ({baseline.get('git_commit')}):")
+    for name, before, after in pairs:
+        change = (after - before) / before * 100 if before else 0.0
+        flag = ''
+        if change > REGRESSION_THRESHOLD and after - before > REGRESSION_MIN_DELTA_MS:
+            flag = '  ⚠ regression'
+            regressions.append(name)
+        print(f"  {name:<36} {before:10.3f} -> {after:10.3f}  ({change:+.1f}%){flag}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the sales ETL and dashboard callback')
+    parser.add_argument('--rows', type=int, default=100_000,
+                        help='synthetic input rows across all shards (default: 100000)')
+    parser.add_argument('--shards', type=int, default=3, help='number of synthetic input files (default: 3)')
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help='worker processes for the parallel ETL case')
+    parser.add_argument('--chunksize', type=int, default=process_sales_data.DEFAULT_CHUNKSIZE,
+                        help='rows per chunk for the streaming ETL case')
+    parser.add_argument('--etl-modes', nargs='+', default=DEFAULT_ETL_MODES, choices=ETL_MODES,
+                        help='ETL modes to time; polars and duckdb are the out-of-core engines '
+                             '(default: every installed mode)')
+    parser.add_argument('--repeat', type=int, default=50, help='update_chart calls per region (default: 50)')
+    parser.add_argument('--gunicorn-workers', type=int, default=2,
+                        help='workers for the gunicorn memory comparison (0 to skip it, default: 2)')
+    parser.add_argument('--data-dir', help='directory for synthetic data (default: a temporary directory)')
+    parser.add_argument('--save', help='write results as JSON to this path')
+    parser.add_argument('--baseline', help='compare results with a JSON file written by --save')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = args.data_dir or tmp_dir
+
+        start = time.perf_counter()
+        data_files = generate_raw_data(work_dir, args.rows, args.shards)
+        print(f"✓ Generated {args.rows:,} synthetic rows in {len(data_files)} file(s) "
+              f"in {time.perf_counter() - start:.2f}s")
+
+        etl = benchmark_etl(data_files, work_dir, args.rows, args.workers, args.chunksize, args.etl_modes)
+        processed_path = os.path.join(work_dir, f'processed_{args.etl_modes[0]}.csv')
+        callbacks = benchmark_callbacks(processed_path, args.repeat)
+    startup = benchmark_startup()
+    worker_memory = benchmark_worker_memory(args.gunicorn_workers) if args.gunicorn_workers > 0 else None
+
+    results = {
+        'git_commit': git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'rows': args.rows,
+        'shards': args.shards,
+        'workers': args.workers,
+        'etl': etl,
+        'callbacks': callbacks,
+        'startup': startup,
+        'worker_memory': worker_memory
+    }
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or '.', exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Results saved to {args.save}")
+
+    regressions = compare_to_baseline(results, args.baseline) if args.baseline else []
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
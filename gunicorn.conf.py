@@ -0,0 +1,26 @@
+# Gunicorn settings for the dashboard: gunicorn app:server
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8050')
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# Import the app once in the master instead of in every worker (GUNICORN_PRELOAD=0 to compare)
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') not in ('', '0')
+
+# The master only forks: the data reload watcher thread runs in each worker (see post_fork)
+os.environ['SALES_RELOAD_WATCHER_IN_WORKERS'] = '1'
+
+
+def when_ready(server):
+    # Load the data before forking so workers share its pages copy-on-write
+    # instead of each paying the load on their first request
+    if server.cfg.preload_app and os.environ.get('SALES_DATA_PRELOAD', '1') not in ('', '0'):
+        import app
+        app.get_dataset()
+
+
+def post_fork(server, worker):
+    import app
+    if app.RELOAD_INTERVAL > 0:
+        app.start_reload_watcher()
@@ -0,0 +1,264 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import app
+
+# Share of callback requests per region-selector value. Most visitors stay on
+# the default "all" view; the rest spread over the single regions
+REGION_MIX = {'all': 0.4, 'north': 0.15, 'south': 0.15, 'east': 0.15, 'west': 0.15}
+
+# Date windows picked at random with --vary-dates, so requests also miss the figure cache
+DATE_WINDOWS = [(None, None), ('2020-06-01', '2021-06-30'), ('2018-01-01', '2019-01-01'),
+                ('2021-01-15', None), (None, '2021-01-14'), ('2019-06-01', '2021-12-31')]
+
+CALLBACK_PATH = '/_dash-update-component'
+
+# Seconds to wait for a started server to answer /health
+SERVER_START_TIMEOUT = 60
+
+# Bounded-thread werkzeug server used when gunicorn is not installed
+WERKZEUG_SERVER = '''
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer
+sys.path.insert(0, sys.argv[1])
+import app
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    multithread = True
+
+    def __init__(self, *args, threads=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+app.get_dataset()
+PooledWSGIServer('127.0.0.1', int(sys.argv[2]), app.server, threads=int(sys.argv[3])).serve_forever()
+'''
+
+
+def gunicorn_available():
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers, threads, log, extra_env=None):
+    """Start the dashboard in a subprocess; returns (process, server name)"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=here, **(extra_env or {}))
+    # Background callbacks answer with a job id instead of the figure, which is not what this measures
+    env.pop('SALES_BACKGROUND_CALLBACKS', None)
+    if gunicorn_available():
+        command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(here, 'gunicorn.conf.py'), 'app:server']
+        env.update(GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(threads))
+        name = 'gunicorn'
+    else:
+        command = [sys.executable, '-c', WERKZEUG_SERVER, here, str(port), str(threads)]
+        name = 'werkzeug'
+    process = subprocess.Popen(command, cwd=here, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{name} exited with code {process.returncode} before serving requests')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return process, name
+        except OSError:
+            time.sleep(0.1)
+    stop_server(process)
+    raise RuntimeError(f'{name} did not answer /health within {SERVER_START_TIMEOUT}s')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run_client(port, deadline, seed, vary_dates, timeout, prerendered=False):
+    """One simulated user: post callbacks back to back on a keep-alive connection until the deadline"""
+    rng = random.Random(seed)
+    headers = {'Content-Type': 'application/json'}
+    if not prerendered:
+        # Measure callback rendering, not the static files written by prerender.py
+        headers['Cache-Control'] = 'no-cache'
+    regions, weights = list(REGION_MIX), list(REGION_MIX.values())
+    body_for = {}
+    latencies, errors = [], 0
+    connection = None
+    while time.monotonic() < deadline:
+        region = rng.choices(regions, weights)[0]
+        window = rng.choice(DATE_WINDOWS) if vary_dates else (None, None)
+        key = (region, window)
+        if key not in body_for:
+            body_for[key] = json.dumps(app.chart_callback_request(region, *window)).encode()
+
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+            connection.request('POST', CALLBACK_PATH, body_for[key], headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            # Reconnect on the next request (server closed the connection or timed out)
+            if connection is not None:
+                connection.close()
+            connection = None
+            ok = False
+        elapsed = time.perf_counter() - start
+
+        if ok:
+            latencies.append(elapsed)
+        else:
+            errors += 1
+    if connection is not None:
+        connection.close()
+    return latencies, errors
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of sorted samples"""
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+
+def run_load(port, clients, duration, vary_dates=False, timeout=30, seed=0, prerendered=False):
+    """Drive the callback endpoint from `clients` threads for `duration` seconds"""
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        futures = [executor.submit(run_client, port, deadline, seed + i, vary_dates, timeout, prerendered)
+                   for i in range(clients)]
+        outcomes = [future.result() for future in futures]
+    wall = time.perf_counter() - start
+
+    latencies = sorted(sample for samples, _ in outcomes for sample in samples)
+    errors = sum(errors for _, errors in outcomes)
+    total = len(latencies) + errors
+    result = {
+        'clients': clients,
+        'seconds': wall,
+        'requests': total,
+        'errors': errors,
+        'error_rate': errors / total if total else 0.0,
+        'requests_per_sec': len(latencies) / wall if wall else None
+    }
+    for q in (50, 90, 99):
+        value = percentile(latencies, q)
+        result[f'p{q}_ms'] = value * 1000 if value is not None else None
+    result['max_ms'] = latencies[-1] * 1000 if latencies else None
+    return result
+
+
+def run_matrix(worker_counts, thread_counts, clients, duration, warmup, vary_dates, log, prerendered=False):
+    results = []
+    multi_process = gunicorn_available()
+    for workers in worker_counts:
+        if workers > 1 and not multi_process:
+            print(f"⚠ Skipping {workers} workers: install gunicorn to run more than one worker process")
+            continue
+        for threads in thread_counts:
+            port = free_port()
+            process, server = start_server(port, workers, threads, log)
+            try:
+                if warmup:
+                    # Fill each worker's figure cache so the measured run sees steady state
+                    run_load(port, clients, warmup, vary_dates, prerendered=prerendered)
+                result = run_load(port, clients, duration, vary_dates, prerendered=prerendered)
+            finally:
+                stop_server(process)
+            result.update(server=server, workers=workers, threads=threads)
+            results.append(result)
+            print(f"✓ {server} {workers}w x {threads}t, {clients} clients: "
+                  f"{result['requests_per_sec']:8.1f} req/s  p50 {result['p50_ms'] or 0:7.2f} ms  "
+                  f"p90 {result['p90_ms'] or 0:7.2f} ms  p99 {result['p99_ms'] or 0:7.2f} ms  "
+                  f"errors {result['error_rate']:.2%}")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the dashboard callback endpoint on a local server')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help='worker process counts to test (more than one needs gunicorn)')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 8], help='threads per worker to test')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent simulated users (default: 16)')
+    parser.add_argument('--duration', type=float, default=10, help='measured seconds per configuration')
+    parser.add_argument('--warmup', type=float, default=2, help='unmeasured seconds before each run (default: 2)')
+    parser.add_argument('--vary-dates', action='store_true',
+                        help='mix in date-range selections so requests also miss the figure cache')
+    parser.add_argument('--prerendered', action='store_true',
+                        help='let the server answer from prerender.py output instead of sending Cache-Control: no-cache')
+    parser.add_argument('--save', help='write results as JSON to this path')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryFile(mode='w+') as log:
+        try:
+            results = run_matrix(args.workers, args.threads, args.clients, args.duration, args.warmup,
+                                 args.vary_dates, log, args.prerendered)
+        except RuntimeError:
+            log.seek(0)
+            print(log.read()[-4000:], file=sys.stderr)
+            raise
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or '.', exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump({
+                'created': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'cpus': os.cpu_count(),
+                'duration': args.duration,
+                'vary_dates': args.vary_dates,
+                'prerendered': args.prerendered,
+                'runs': results
+            }, f, indent=2)
+        print(f"✓ Results saved to {args.save}")
+    return 1 if any(result['errors'] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+import app
+
+# Compression is done once per ETL run, so use the smallest output rather than the fastest
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+def write_atomically(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def previous_files(output_dir):
+    """Body files listed in the manifest of an earlier run, if it can be read"""
+    try:
+        with open(os.path.join(output_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        return {name for entry in manifest['regions'].values() for name in entry['files'].values()}
+    except (OSError, ValueError, KeyError, AttributeError, TypeError):
+        return set()
+
+
+def prerender(output_dir=app.PRERENDER_DIR):
+    """Render the default-view chart response of every region and write it with precompressed copies
+
+    Bodies come from the live callback endpoint, so they are byte-identical to
+    what the dashboard would send. File names carry the body hash, and the
+    manifest is replaced last, so a running server never pairs a new manifest
+    with missing files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    previous = previous_files(output_dir)
+    data = app.get_dataset()
+    client = app.app.server.test_client()
+    encodings = {'gzip': '.gz'}
+    if app.brotli is not None:
+        encodings['br'] = '.br'
+
+    regions = {}
+    for region in ['all'] + sorted(data.product().region_series):
+        # no-cache skips any earlier prerendered response and asks for a freshly built one
+        response = client.post('/_dash-update-component', json=app.chart_callback_request(region),
+                               headers={'Cache-Control': 'no-cache'})
+        if response.status_code != 200:
+            raise RuntimeError(f"Rendering '{region}' failed with HTTP {response.status_code}")
+        body = response.get_data()
+        etag = hashlib.sha256(body).hexdigest()
+
+        name = f'{region}-{etag[:16]}.json'
+        files = {'identity': name}
+        write_atomically(os.path.join(output_dir, name), body)
+        for encoding, extension in encodings.items():
+            level = BROTLI_QUALITY if encoding == 'br' else GZIP_LEVEL
+            files[encoding] = name + extension
+            write_atomically(os.path.join(output_dir, files[encoding]), app.compress_body(body, encoding, level))
+        regions[region] = {'etag': etag, 'bytes': len(body), 'files': files}
+
+    manifest = {
+        'data_version': data.version,
+        'render_version': app.RENDER_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'regions': regions
+    }
+    write_atomically(os.path.join(output_dir, 'manifest.json'), json.dumps(manifest, indent=2).encode())
+
+    # Remove bodies of earlier runs now that nothing refers to them. Only files this script wrote are
+    # touched (listed in the old manifest, or named like a body of a run that never wrote one), as the
+    # directory may be shared with other data
+    current = {name for entry in regions.values() for name in entry['files'].values()}
+    body_name = re.compile(rf"^({'|'.join(map(re.escape, regions))})-[0-9a-f]{{16}}\.json(\.gz|\.br)?$")
+    for name in os.listdir(output_dir):
+        if name not in current and (name in previous or body_name.match(name)):
+            os.remove(os.path.join(output_dir, name))
+    return manifest
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Prerender the default chart of every region after an ETL run')
+    parser.add_argument('--output-dir', default=app.PRERENDER_DIR,
+                        help=f'directory for the prerendered responses (default: {app.PRERENDER_DIR})')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    manifest = prerender(args.output_dir)
+    for region, entry in manifest['regions'].items():
+        sizes = ', '.join(f"{encoding} {os.path.getsize(os.path.join(args.output_dir, name)):,} B"
+                          for encoding, name in entry['files'].items())
+        print(f"✓ {region:<6} {sizes}")
+    print(f"✓ Prerendered {len(manifest['regions'])} region(s) for data version {manifest['data_version']} "
+          f"in {time.perf_counter() - start:.2f}s")
+    print(f"✓ Output saved to {args.output_dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
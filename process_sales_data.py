@@ -1,44 +1,482 @@
-import pandas as pd
+import argparse
+import glob
+import hashlib
+import importlib.util
+import json
 import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from profiling import DEFAULT_PROFILE_DIR, PROFILE_FORMATS, RunProfiler
+
+# polars and duckdb are optional: each runs the whole pipeline as one lazy,
+# multi-threaded scan that streams from the raw files to the output. They are
+# imported only when their engine runs, since app.py imports this module too.
+ENGINES = ('pandas', 'polars', 'duckdb')
+
+# Raw daily sales files, discovered by glob
+DATA_GLOB = 'data/daily_sales_data_*.csv'
+
+
+def discover_data_files(pattern=DATA_GLOB):
+    """Files matching the glob in output order, numbers sorted numerically (_2 before _10)"""
+    def natural_key(path):
+        return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', path)]
+    return sorted(glob.glob(pattern), key=natural_key)
+
+
+DATA_FILES = discover_data_files()
+
+OUTPUT_PATH = 'data/processed_sales_data.csv'
+OUTPUT_COLUMNS = ['Sales', 'Date', 'Region', 'Product']
+
+# Bump when transform() changes which rows or values it writes, so incremental
+# runs rebuild outputs written by an older version instead of splicing into them
+OUTPUT_FORMAT_VERSION = 2
+
+# Raw columns and read-time dtypes. Text columns are read as categoricals so
+# string work (lower-casing, stripping '$') runs once per distinct value
+RAW_COLUMNS = ['product', 'price', 'quantity', 'date', 'region']
+RAW_DTYPES = {'product': 'category', 'price': 'category', 'date': 'category', 'region': 'category'}
+
+# Optional columnar copies of the output (need pyarrow)
+COLUMNAR_FORMATS = ('parquet', 'feather')
+# Bytes of CSV converted per batch when writing them
+COLUMNAR_BLOCK_SIZE = 1 << 20
+# Columns stored as dictionary-encoded categoricals
+CATEGORY_COLUMNS = ('Region', 'Product')
+
+# Rows per chunk when streaming (bounds peak memory per file)
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def read_raw(file, chunksize=None):
+    """Read a raw daily sales file (or an iterator of chunks) with the fast-path dtypes"""
+    return pd.read_csv(file, usecols=RAW_COLUMNS, dtype=RAW_DTYPES, chunksize=chunksize)
+
+
+def per_category(series, func, missing):
+    """Evaluate func on the distinct values of a column and broadcast back to every row
+
+    Works on category codes, so no per-row Python strings are created. Rows
+    with a missing value (code -1) get `missing`.
+    """
+    series = series.astype('category')
+    values = np.append(np.asarray(func(series.cat.categories)), missing)
+    return values[series.cat.codes.to_numpy()]
+
+
+def transform(df):
+    """Derive the Sales column for every product
+
+    Product names are lower-cased so the dashboard can index them directly;
+    rows without a product are dropped.
+    """
+    product = per_category(df['product'], lambda products: products.str.lower(), None)
+    has_product = pd.notna(product)
+
+    # Remove $ symbol safely (no regex warnings) and convert to float
+    price = per_category(df['price'], lambda prices: prices.str.replace('$', '', regex=False).astype(float), np.nan)
+
+    # Calculate sales (price × quantity) and select the output columns
+    return pd.DataFrame({
+        'Sales': price[has_product] * df['quantity'].to_numpy()[has_product],
+        'Date': df['date'][has_product].to_numpy(),
+        'Region': df['region'][has_product].to_numpy(),
+        'Product': product[has_product]
+    })
+
+
+def process_in_memory(data_files, output_path):
+    """Load every file, transform it and write the combined output"""
+    # Transform per file so categorical columns keep their own categories
+    df_output = pd.concat((transform(read_raw(file)) for file in data_files), ignore_index=True)
+    df_output.to_csv(output_path, index=False)
+    return len(df_output)
+
+
+def process_streaming(data_files, output_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Transform each file in bounded chunks and append them to the output
+
+    Only one chunk is held in memory at a time, so peak memory is flat in the
+    number of files and rows. The result is byte-identical to process_in_memory.
+    """
+    total_rows = 0
+    header = True
+    with open(output_path, 'w', newline='') as out:
+        for file in data_files:
+            for chunk in read_raw(file, chunksize=chunksize):
+                df_chunk = transform(chunk)
+                df_chunk.to_csv(out, index=False, header=header)
+                header = False
+                total_rows += len(df_chunk)
+
+        # Keep the header even when no rows matched
+        if header:
+            pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(out, index=False)
+    return total_rows
+
+
+def process_shard(file, chunksize=None):
+    """Transform a single input file (run inside a worker process)"""
+    if chunksize is None:
+        return transform(read_raw(file))
+    return pd.concat((transform(chunk) for chunk in read_raw(file, chunksize=chunksize)), ignore_index=True)
+
+
+def process_parallel(data_files, output_path, workers, chunksize=None):
+    """Fan input files out to a process pool and write results in input order
+
+    executor.map yields results in submission order, so the output is the same
+    as the serial path regardless of which shard finishes first.
+    """
+    total_rows = 0
+    header = True
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(output_path, 'w', newline='') as out:
+        for df_shard in executor.map(process_shard, data_files, [chunksize] * len(data_files)):
+            df_shard.to_csv(out, index=False, header=header)
+            header = False
+            total_rows += len(df_shard)
+
+        # Keep the header even when there are no input files
+        if header:
+            pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(out, index=False)
+    return total_rows
+
+
+def write_empty_output(output_path):
+    pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(output_path, index=False)
+    return 0
+
+
+def process_polars(data_files, output_path):
+    """Run the pipeline as a Polars lazy scan over every input (needs polars)
+
+    sink_csv streams batches to the output as they are produced, so inputs
+    larger than memory work. Row order and number formatting match the
+    pandas engine byte for byte.
+    """
+    if not data_files:
+        return write_empty_output(output_path)
+    import polars as pl
+    scan = pl.scan_csv(list(data_files), schema_overrides={
+        'product': pl.String, 'price': pl.String, 'quantity': pl.Int64, 'date': pl.String, 'region': pl.String
+    })
+    scan.filter(pl.col('product').is_not_null()).select(
+        Sales=pl.col('price').str.replace('$', '', literal=True).cast(pl.Float64) * pl.col('quantity'),
+        Date=pl.col('date'),
+        Region=pl.col('region'),
+        Product=pl.col('product').str.to_lowercase()
+    ).sink_csv(output_path)
+
+    # The sink doesn't report a row count, so count output lines (minus the header)
+    with open(output_path, 'rb') as f:
+        return sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b'')) - 1
+
+
+def process_duckdb(data_files, output_path):
+    """Run the pipeline as one DuckDB COPY query over every input (needs duckdb)
+
+    DuckDB scans the files in parallel and spills to disk when needed, while
+    keeping insertion order, so the output matches the pandas engine.
+    """
+    if not data_files:
+        return write_empty_output(output_path)
+    # COPY takes the target as a literal, so quote it as one
+    target = output_path.replace("'", "''")
+    import duckdb
+    with duckdb.connect() as connection:
+        connection.execute(f"""
+            COPY (
+                SELECT CAST(replace(price, '$', '') AS DOUBLE) * quantity AS Sales,
+                       date AS Date, region AS Region, lower(product) AS Product
+                -- union_by_name sniffs each file on its own (line endings can differ between files)
+                FROM read_csv($files, header = true, union_by_name = true, columns = {{
+                    'product': 'VARCHAR', 'price': 'VARCHAR', 'quantity': 'BIGINT',
+                    'date': 'VARCHAR', 'region': 'VARCHAR'
+                }})
+                WHERE product IS NOT NULL
+            ) TO '{target}' (HEADER, DELIMITER ',')
+        """, {'files': list(data_files)})
+        # COPY reports the number of rows written
+        return connection.fetchone()[0]
+
+
+def engine_installed(engine):
+    """Whether an engine's package is importable, without importing it"""
+    return engine == 'pandas' or importlib.util.find_spec(engine) is not None
+
+
+def process_with_engine(engine, data_files, output_path):
+    """Out-of-core run through polars or duckdb; raises RuntimeError if the engine is not installed"""
+    process = {'polars': process_polars, 'duckdb': process_duckdb}[engine]
+    if not engine_installed(engine):
+        raise RuntimeError(f"The {engine} engine needs {engine} installed (pip install {engine})")
+    return process(data_files, str(output_path))
+
+
+def manifest_path_for(output_path):
+    """Manifest lives next to the output, e.g. processed_sales_data.manifest.json"""
+    root, _ = os.path.splitext(output_path)
+    return f'{root}.manifest.json'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(output_path):
+    """Return the manifest if it still describes the output on disk, else None"""
+    manifest_path = manifest_path_for(output_path)
+    if not (os.path.exists(manifest_path) and os.path.exists(output_path)):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    # Rows written with other columns or by an older transform can't be reused
+    if manifest.get('columns') != OUTPUT_COLUMNS or manifest.get('format_version') != OUTPUT_FORMAT_VERSION:
+        return None
+
+    # Any other writer (e.g. a full run) invalidates the recorded byte offsets
+    stat = os.stat(output_path)
+    if manifest.get('output_size') != stat.st_size or manifest.get('output_mtime_ns') != stat.st_mtime_ns:
+        return None
+    return manifest
+
+
+def shard_unchanged(file, entry):
+    """Cheap size/mtime check first, content hash only when those differ"""
+    if entry is None:
+        return False
+    stat = os.stat(file)
+    if stat.st_size != entry['size']:
+        return False
+    if stat.st_mtime_ns == entry['mtime_ns']:
+        return True
+    return file_sha256(file) == entry['sha256']
+
+
+def process_incremental(data_files, output_path, workers=1, chunksize=None):
+    """Reparse only added or changed files and splice them into the existing output
+
+    The manifest records each file's fingerprint and the byte range of its rows
+    in the output, so unchanged files are copied across as raw bytes without
+    being parsed again. Files that are no longer listed are dropped. Returns
+    (total_rows, reprocessed_files).
+    """
+    manifest = load_manifest(output_path)
+    previous = {}
+    if manifest is not None:
+        offset = manifest['header_bytes']
+        for entry in manifest['shards']:
+            previous[entry['path']] = dict(entry, offset=offset)
+            offset += entry['bytes']
+
+    changed = [file for file in data_files if not shard_unchanged(file, previous.get(file))]
+
+    # Render changed files to CSV bytes (in parallel when requested)
+    if workers > 1 and len(changed) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            frames = list(executor.map(process_shard, changed, [chunksize] * len(changed)))
+    else:
+        frames = [process_shard(file, chunksize) for file in changed]
+    rendered = {
+        file: (len(df_shard), df_shard.to_csv(index=False, header=False).encode())
+        for file, df_shard in zip(changed, frames)
+    }
+
+    header = pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(index=False).encode()
+    shards = []
+    total_rows = 0
+    tmp_path = f'{output_path}.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(header)
+        old = open(output_path, 'rb') if manifest is not None else None
+        try:
+            for file in data_files:
+                if file in rendered:
+                    rows, block = rendered[file]
+                else:
+                    entry = previous[file]
+                    old.seek(entry['offset'])
+                    rows, block = entry['rows'], old.read(entry['bytes'])
+                out.write(block)
+                total_rows += rows
+
+                stat = os.stat(file)
+                shards.append({
+                    'path': file,
+                    'size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'sha256': file_sha256(file) if file in rendered else previous[file]['sha256'],
+                    'rows': rows,
+                    'bytes': len(block)
+                })
+        finally:
+            if old is not None:
+                old.close()
+    os.replace(tmp_path, output_path)
+
+    stat = os.stat(output_path)
+    with open(manifest_path_for(output_path), 'w') as f:
+        json.dump({
+            'columns': OUTPUT_COLUMNS,
+            'format_version': OUTPUT_FORMAT_VERSION,
+            'output_size': stat.st_size,
+            'output_mtime_ns': stat.st_mtime_ns,
+            'header_bytes': len(header),
+            'shards': shards
+        }, f, indent=2)
+    return total_rows, changed
+
+
+def columnar_path_for(output_path, fmt):
+    root, _ = os.path.splitext(output_path)
+    return f'{root}.{fmt}'
+
+
+def write_columnar(output_path, fmt, block_size=COLUMNAR_BLOCK_SIZE):
+    """Write a typed columnar copy of the CSV output
+
+    Date is stored as a native datetime, Region and Product as
+    dictionary-encoded categoricals and Sales as float. Feather is written
+    uncompressed so readers can memory-map it.
+
+    The CSV is read and written one block of `block_size` bytes at a time, so
+    memory stays flat like the --stream, --incremental and engine runs.
+    Feather files only allow a dictionary to grow between batches, so each
+    categorical column is encoded against one dictionary shared by every batch.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+
+    reader = pa_csv.open_csv(
+        output_path, read_options=pa_csv.ReadOptions(block_size=block_size),
+        # Empty fields are missing values, as in pandas
+        convert_options=pa_csv.ConvertOptions(strings_can_be_null=True, column_types={
+            'Sales': pa.float64(), 'Date': pa.timestamp('ns'), 'Region': pa.string(), 'Product': pa.string()
+        }))
+    schema = pa.schema([
+        pa.field(name, pa.dictionary(pa.int32(), pa.string())) if name in CATEGORY_COLUMNS else field
+        for name, field in zip(reader.schema.names, reader.schema)
+    ])
+    categories = {name: pa.array([], pa.string()) for name in CATEGORY_COLUMNS if name in schema.names}
+
+    def encode(batch):
+        columns = []
+        for name, column in zip(batch.schema.names, batch.columns):
+            if name in categories:
+                values = pc.unique(column.drop_null())
+                new = pc.filter(values, pc.invert(pc.is_in(values, value_set=categories[name])))
+                categories[name] = pa.concat_arrays([categories[name], new])
+                indices = pc.index_in(column, value_set=categories[name]).cast(pa.int32())
+                column = pa.DictionaryArray.from_arrays(indices, categories[name])
+            columns.append(column)
+        return pa.record_batch(columns, schema=schema)
+
+    columnar_path = columnar_path_for(output_path, fmt)
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(columnar_path, schema)
+    else:
+        writer = ipc.new_file(columnar_path, schema, options=ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+    with writer:
+        for batch in reader:
+            writer.write_batch(encode(batch))
+    return columnar_path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Process raw daily sales into per-product sales data')
+    parser.add_argument('--stream', action='store_true',
+                        help='read inputs in bounded chunks instead of loading them fully')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f'rows per chunk in streaming mode (default: {DEFAULT_CHUNKSIZE})')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes used to parse input files (default: 1)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only reprocess input files that changed since the last incremental run')
+    parser.add_argument('--columnar', choices=COLUMNAR_FORMATS,
+                        help='also write a typed Parquet or Feather copy of the output (requires pyarrow)')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile the run and write the artifact to --profile-dir (main process only)')
+    parser.add_argument('--profile-dir', default=DEFAULT_PROFILE_DIR,
+                        help=f'directory for profile artifacts (default: {DEFAULT_PROFILE_DIR})')
+    parser.add_argument('--profile-format', choices=PROFILE_FORMATS, default='pstats',
+                        help='cProfile pstats or pyinstrument HTML (default: pstats)')
+    parser.add_argument('--engine', choices=ENGINES, default='pandas',
+                        help='pandas, or a lazy out-of-core scan with polars or duckdb (default: pandas)')
+    parser.add_argument('--inputs', default=DATA_GLOB,
+                        help=f'glob for the raw daily sales files (default: {DATA_GLOB})')
+    parser.add_argument('--output', default=OUTPUT_PATH,
+                        help=f'output CSV path (default: {OUTPUT_PATH})')
+    args = parser.parse_args(argv)
+    if args.engine != 'pandas' and (args.stream or args.workers > 1 or args.incremental):
+        parser.error(f'--engine {args.engine} already streams with multiple threads; '
+                     'drop --stream, --workers and --incremental')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Ensure output directory exists
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+
+    profiler = RunProfiler('etl', args.profile_dir, args.profile_format) if args.profile else None
+    if profiler:
+        profiler.start()
+
+    start = time.perf_counter()
+    data_files = discover_data_files(args.inputs)
+    chunksize = args.chunksize if args.stream else None
+    reprocessed = data_files
+    if args.engine != 'pandas':
+        total_rows = process_with_engine(args.engine, data_files, args.output)
+    elif args.incremental:
+        total_rows, reprocessed = process_incremental(data_files, args.output, args.workers, chunksize)
+    elif args.workers > 1:
+        total_rows = process_parallel(data_files, args.output, args.workers, chunksize)
+    elif args.stream:
+        total_rows = process_streaming(data_files, args.output, args.chunksize)
+    else:
+        total_rows = process_in_memory(data_files, args.output)
+    columnar_path = write_columnar(args.output, args.columnar) if args.columnar else None
+    elapsed = time.perf_counter() - start
+    profile_path = profiler.stop() if profiler else None
+
+    # Professional summary output
+    print("✓ Processing complete!")
+    print("✓ Kept every product (indexed by the Product column)")
+    print("✓ Created Sales field (Price × Quantity)")
+    if args.stream:
+        print(f"✓ Streamed input in chunks of {args.chunksize} rows")
+    if args.engine != 'pandas':
+        print(f"✓ Ran a lazy {args.engine} scan over {args.inputs}")
+    if args.incremental:
+        print(f"✓ Reprocessed {len(reprocessed)} of {len(data_files)} file(s), manifest at {manifest_path_for(args.output)}")
+    print(f"✓ Output saved to {args.output}")
+    if columnar_path:
+        print(f"✓ Columnar copy saved to {columnar_path}")
+    if profile_path:
+        print(f"✓ Profile saved to {profile_path}")
+    print(f"✓ Total rows processed: {total_rows}")
+    print(f"✓ Processed {len(data_files)} file(s) with {args.workers} worker(s) in {elapsed:.2f}s")
+    input_mb = sum(os.path.getsize(file) for file in data_files) / 2**20
+    print(f"✓ Throughput: {total_rows / elapsed:,.0f} output rows/s ({input_mb / elapsed:,.1f} MB/s of input)")
+    print("\nFirst 5 rows of output:")
+    print(pd.read_csv(args.output, nrows=5))
+
 
-# Ensure data directory exists
-os.makedirs('data', exist_ok=True)
-
-# Load all three CSV files
-data_files = [
-    'data/daily_sales_data_0.csv',
-    'data/daily_sales_data_1.csv',
-    'data/daily_sales_data_2.csv'
-]
-
-# Combine all data using generator expression (memory efficient)
-df_all = pd.concat((pd.read_csv(file) for file in data_files), ignore_index=True)
-
-# Filter for only Pink Morsels and explicitly copy to avoid SettingWithCopyWarning
-df_pink = df_all[df_all['product'].str.lower() == 'pink morsel'].copy()
-
-# Remove $ symbol safely (no regex warnings) and convert to float
-df_pink['price'] = df_pink['price'].str.replace('$', '', regex=False).astype(float)
-
-# Calculate sales (price × quantity)
-df_pink['sales'] = df_pink['price'] * df_pink['quantity']
-
-# Select required columns and rename in one step (more readable)
-df_output = df_pink[['sales', 'date', 'region']].rename(columns={
-    'sales': 'Sales',
-    'date': 'Date', 
-    'region': 'Region'
-})
-
-# Save to output file
-output_path = 'data/processed_sales_data.csv'
-df_output.to_csv(output_path, index=False)
-
-# Professional summary output
-print("✓ Processing complete!")
-print("✓ Filtered for Pink Morsels only")
-print("✓ Created Sales field (Price × Quantity)")
-print(f"✓ Output saved to {output_path}")
-print(f"✓ Total rows processed: {len(df_output)}")
-print("\nFirst 5 rows of output:")
-print(df_output.head())
+if __name__ == '__main__':
+    main()
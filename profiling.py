@@ -0,0 +1,110 @@
+import cProfile
+import os
+import random
+import re
+import time
+
+# pyinstrument is optional: it adds flamegraph-style HTML output next to cProfile's pstats
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+DEFAULT_PROFILE_DIR = 'profiles'
+PROFILE_FORMATS = ('pstats', 'html')
+
+
+def profile_path(directory, name, extension):
+    """Unique artifact path such as profiles/etl-20240101-120000-123456.pstats"""
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S') + f'-{time.time_ns() // 1000 % 1_000_000:06d}'
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '-', name).strip('-') or 'request'
+    return os.path.join(directory, f'{safe_name}-{stamp}.{extension}')
+
+
+def check_format(fmt):
+    """Raise if `fmt` is not a known profile format or its profiler is not installed"""
+    if fmt not in PROFILE_FORMATS:
+        raise ValueError(f"Unknown profile format {fmt!r}, expected one of {', '.join(PROFILE_FORMATS)}")
+    if fmt == 'html' and SamplingProfiler is None:
+        raise RuntimeError("HTML profiles need pyinstrument (pip install pyinstrument)")
+
+
+class RunProfiler:
+    """Profile one block of work and write the artifact when it finishes
+
+    'pstats' uses cProfile (load with `python -m pstats <file>` or snakeviz),
+    'html' uses pyinstrument and needs it installed.
+    """
+
+    def __init__(self, name, directory=DEFAULT_PROFILE_DIR, fmt='pstats'):
+        check_format(fmt)
+        self.name = name
+        self.directory = directory
+        self.fmt = fmt
+        self.path = None
+        self._profiler = None
+
+    def start(self):
+        profiler = SamplingProfiler() if self.fmt == 'html' else cProfile.Profile()
+        try:
+            if self.fmt == 'html':
+                profiler.start()
+            else:
+                profiler.enable()
+        except (RuntimeError, ValueError):
+            # Another profiler is already active in this interpreter
+            return False
+        self._profiler = profiler
+        return True
+
+    def stop(self):
+        if self._profiler is None:
+            return None
+        if self.fmt == 'html':
+            self._profiler.stop()
+            self.path = profile_path(self.directory, self.name, 'html')
+            with open(self.path, 'w') as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            self.path = profile_path(self.directory, self.name, 'pstats')
+            self._profiler.dump_stats(self.path)
+        self._profiler = None
+        return self.path
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def install_request_profiler(server, rate, directory=DEFAULT_PROFILE_DIR, fmt='pstats',
+                             path_pattern=r'/_dash-update-component$'):
+    """Profile a random `rate` fraction of matching requests on a Flask server
+
+    Each sampled request writes its own artifact to `directory`, so the hook
+    can stay on for a small share of production traffic. The format is
+    checked here, so a missing pyinstrument fails at startup rather than in
+    every sampled request.
+    """
+    from flask import g, request
+
+    check_format(fmt)
+
+    matcher = re.compile(path_pattern)
+
+    @server.before_request
+    def start_request_profile():
+        if matcher.search(request.path) and random.random() < rate:
+            profiler = RunProfiler(request.path, directory, fmt)
+            if profiler.start():
+                g.request_profiler = profiler
+
+    @server.teardown_request
+    def stop_request_profile(exc):
+        profiler = g.pop('request_profiler', None)
+        if profiler is not None:
+            profiler.stop()
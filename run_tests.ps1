@@ -47,7 +47,7 @@ Write-Host ""
 Write-Host "🧪 Running test suite..." -ForegroundColor Yellow
 Write-Host ""
 
-& python -m pytest test_app.py -v --tb=short
+& python -m pytest test_app.py test_process_sales_data.py test_benchmark.py test_metrics.py test_profiling.py test_loadtest.py test_prerender.py -v --tb=short
 
 if ($LASTEXITCODE -eq 0) {
     Write-Host ""
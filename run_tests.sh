@@ -42,7 +42,7 @@ echo ""
 echo "🧪 Running test suite..."
 echo ""
 
-if pytest test_app.py -v --tb=short; then
+if pytest test_app.py test_process_sales_data.py test_benchmark.py test_metrics.py test_profiling.py test_loadtest.py test_prerender.py -v --tb=short; then
     echo ""
     echo "=========================================="
     echo "✅ All tests passed!"
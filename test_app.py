@@ -1,5 +1,5 @@
 import pytest
-from app import app
+from app import app, chart_callback_request
 
 
 class TestDashAppLayout:
@@ -105,6 +105,28 @@ class TestDashAppLayout:
         
         print("✓ Region picker test passed")
 
+    def test_date_range_picker_is_present(self):
+        """Test that the date-range picker is present"""
+        picker = self.find_element_by_id(app.layout, 'date-range')
+        assert picker is not None, "DatePickerRange element with id 'date-range' not found"
+        assert type(picker).__name__ == 'DatePickerRange', f"Expected DatePickerRange element, got {type(picker).__name__}"
+        print("✓ Date range picker test passed")
+
+    def test_granularity_picker_is_present(self):
+        """Test that the daily/weekly/monthly granularity selector is present"""
+        selector = self.find_element_by_id(app.layout, 'granularity-selector')
+        assert selector is not None, "RadioItems element with id 'granularity-selector' not found"
+        assert [opt['value'] for opt in selector.options] == ['daily', 'weekly', 'monthly']
+        print("✓ Granularity picker test passed")
+
+    def test_product_picker_is_present(self):
+        """Test that the product dropdown is present and defaults to pink morsel"""
+        selector = self.find_element_by_id(app.layout, 'product-selector')
+        assert selector is not None, "Dropdown element with id 'product-selector' not found"
+        assert type(selector).__name__ == 'Dropdown', f"Expected Dropdown element, got {type(selector).__name__}"
+        assert selector.value == 'pink morsel'
+        print("✓ Product picker test passed")
+
 
 class TestDashAppCallbacks:
     """Test suite for Dash app callbacks and functionality"""
@@ -138,3 +160,607 @@ class TestDashAppCallbacks:
         
         print("✓ Data availability test passed")
 
+
+    def test_columnar_copy_is_preferred(self, tmp_path):
+        """Test that a fresh Feather copy is loaded instead of the CSV with the same data"""
+        pytest.importorskip('pyarrow')
+        import shutil
+        import pandas as pd
+        import process_sales_data
+        from app import load_sales_data, find_columnar_copy
+
+        csv_path = str(shutil.copy('data/processed_sales_data.csv', tmp_path))
+        from_csv = load_sales_data(csv_path, cache_dir=None)
+        feather_path = process_sales_data.write_columnar(csv_path, 'feather')
+
+        assert find_columnar_copy(csv_path) == feather_path, "Feather copy was not detected"
+        from_feather = load_sales_data(csv_path, cache_dir=None)
+        assert from_feather['Region'].dtype == 'category', "Region should load as a categorical"
+        assert from_feather['Date'].equals(from_csv['Date'])
+        # pyarrow parses floats exactly, like pandas' round-trip parser (the default one can be off by an ulp)
+        exact_sales = pd.read_csv(csv_path, float_precision='round_trip')['Sales']
+        assert from_feather['Sales'].sort_index().equals(exact_sales)
+        print("✓ Columnar loading test passed")
+
+
+class TestUpdateChart:
+    """Test suite for the region-selector callback output"""
+
+    REGIONS = ['all', 'north', 'south', 'east', 'west']
+
+    def test_callback_returns_figure_for_every_region(self):
+        """Test that update_chart builds a figure and summary for each region option"""
+        from app import update_chart
+
+        for region in self.REGIONS:
+            fig, summary = update_chart(region)
+            expected_traces = 4 if region == 'all' else 1
+            assert len(fig.data) == expected_traces, f"Expected {expected_traces} traces for '{region}', got {len(fig.data)}"
+            assert summary is not None, f"Summary missing for '{region}'"
+        print("✓ Callback output test passed")
+
+    def test_precomputed_stats_match_full_scan(self):
+        """Test that the precomputed region index matches boolean-mask scans of the data"""
+        from app import get_dataset, PRICE_INCREASE_DATE
+        index = get_dataset().product()
+        df = index.df
+
+        for region in self.REGIONS:
+            data = df if region == 'all' else df[df['Region'] == region]
+            before = data[data['Date'] < PRICE_INCREASE_DATE]['Sales']
+            after = data[data['Date'] >= PRICE_INCREASE_DATE]['Sales']
+            stats = index.region_stats[region]
+            assert stats['before_total'] == pytest.approx(before.sum())
+            assert stats['after_total'] == pytest.approx(after.sum())
+            assert stats['before_avg'] == pytest.approx(before.mean())
+            assert stats['after_avg'] == pytest.approx(after.mean())
+            if region != 'all':
+                assert index.region_series[region]['Date'].is_monotonic_increasing, f"Series for '{region}' is not date-sorted"
+        print("✓ Precomputed stats test passed")
+
+    def test_repeat_selection_is_served_from_cache(self, monkeypatch):
+        """Test that repeat selections hit the figure cache instead of rebuilding the chart"""
+        import app as app_module
+
+        app_module.figure_cache.clear()
+        calls = []
+        build_chart = app_module.build_chart
+        monkeypatch.setattr(app_module, 'build_chart', lambda region, *args: calls.append(region) or build_chart(region, *args))
+
+        first = app_module.update_chart('north')
+        second = app_module.update_chart('north')
+        assert first is second, "Repeat selection should return the cached result"
+        assert calls == ['north'], f"Chart should be built once, built for {calls}"
+        assert app_module.figure_cache.stats()['hits'] == 1
+        assert app_module.figure_cache.stats()['misses'] == 1
+
+        # A new data version invalidates the cached entries
+        monkeypatch.setattr(app_module, 'dataset', app_module.SalesDataset(app_module.get_dataset().df, 'reloaded'))
+        app_module.update_chart('north')
+        assert calls == ['north', 'north'], "Cache should be invalidated when the data version changes"
+        print("✓ Figure cache test passed")
+
+    def test_cache_is_bounded(self):
+        """Test that the figure cache evicts the least recently used entries"""
+        from app import FigureCache
+
+        cache = FigureCache(maxsize=2)
+        for key in ['north', 'south', 'east']:
+            cache.get_or_build(key, 'v1', lambda: key)
+        assert cache.stats()['size'] == 2
+        cache.get_or_build('north', 'v1', lambda: 'rebuilt')
+        assert cache.stats()['hits'] == 0, "Evicted entry should be rebuilt"
+        print("✓ Cache bound test passed")
+
+    def test_downsampling_bounds_points_and_keeps_boundary(self):
+        """Test that long series are downsampled while keeping the price-increase boundary exact"""
+        import pandas as pd
+        from app import downsample_series, PRICE_INCREASE_DATE
+
+        dates = pd.date_range('2015-01-01', periods=20000, freq='3h')
+        data = pd.DataFrame({'Date': dates, 'Sales': range(len(dates))})
+        reduced = downsample_series(data, max_points=500)
+
+        assert len(reduced) <= 502, f"Expected about 500 points, got {len(reduced)}"
+        assert reduced['Date'].iloc[0] == dates[0] and reduced['Date'].iloc[-1] == dates[-1]
+        split = dates.searchsorted(PRICE_INCREASE_DATE)
+        assert dates[split - 1] in set(reduced['Date']), "Last point before the price increase was dropped"
+        assert dates[split] in set(reduced['Date']), "First point after the price increase was dropped"
+        print("✓ Downsampling test passed")
+
+    def test_zoom_returns_full_resolution(self):
+        """Test that a zoomed relayoutData range is served at full resolution"""
+        from app import update_chart, get_dataset
+
+        north = get_dataset().product().region_series['north']
+        start, end = north['Date'].iloc[100], north['Date'].iloc[200]
+        fig, _ = update_chart('north', {'xaxis.range[0]': str(start), 'xaxis.range[1]': str(end)})
+
+        # Every point in the window plus one neighbour each side
+        assert len(fig.data[0].x) == 103, f"Expected 103 points in the zoomed window, got {len(fig.data[0].x)}"
+        assert fig.layout.xaxis.range is not None, "Zoomed figure should keep the requested x range"
+        print("✓ Zoom resolution test passed")
+
+    def test_direct_calls_with_unusual_relayout_data(self):
+        """Test that non-zoom and out-of-range relayoutData render a figure instead of raising"""
+        from app import update_chart, get_dataset
+
+        north = get_dataset().product().region_series['north']
+        fig, _ = update_chart('north', {'autosize': True})
+        assert len(fig.data) == 1, "A direct call outside a callback should still render the chart"
+
+        # Years pandas can't hold are clamped, so the whole series is visible
+        fig, _ = update_chart('north', {'xaxis.range[0]': '1500-01-01', 'xaxis.range[1]': '3000-01-01'})
+        assert len(fig.data[0].x) == len(north)
+        fig, _ = update_chart('north', start_date='1500-01-01', end_date='3000-01-01')
+        assert len(fig.data[0].x) > 0
+        print("✓ Unusual relayout test passed")
+
+    def test_webgl_traces_above_threshold(self, monkeypatch):
+        """Test that update_chart switches to Scattergl once the selection passes the threshold"""
+        import app as app_module
+
+        fig, _ = app_module.build_chart('north')
+        assert all(trace.type == 'scatter' for trace in fig.data), "Small selections should use SVG scatter traces"
+
+        monkeypatch.setattr(app_module, 'WEBGL_THRESHOLD', 100)
+        for region in self.REGIONS:
+            fig, _ = app_module.build_chart(region)
+            assert all(trace.type == 'scattergl' for trace in fig.data), f"Expected Scattergl traces for '{region}'"
+            assert fig.data[0].hovertemplate.startswith('<b>%{fullData.name}</b>'), "Hover template should be unchanged"
+            assert len(fig.layout.shapes) == 1, "Price increase line should still be drawn"
+        print("✓ WebGL trace selection test passed")
+
+    def test_dataset_is_loaded_lazily(self):
+        """Test that importing the app does not load the data until it is first needed"""
+        import os
+        import subprocess
+        import sys
+
+        code = 'import app; assert app.dataset is None; app.get_dataset(); assert app.dataset is not None'
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+
+        env = dict(os.environ, SALES_DATA_PRELOAD='0')
+        code = 'import app; assert app.dataset is None'
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env)
+        assert result.returncode == 0, result.stderr
+        print("✓ Lazy loading test passed")
+
+    def test_date_window_stats_match_full_scan(self):
+        """Test that prefix-sum window stats and searchsorted slicing match boolean masks"""
+        import numpy as np
+        import pandas as pd
+        from app import get_dataset, selected_window, slice_window, summarize_window, PRICE_INCREASE_DATE
+
+        index = get_dataset().product()
+        windows = [('2020-06-01', '2021-06-30'), ('2018-01-01', '2019-01-01'),
+                   ('2021-01-15', None), (None, '2021-01-14')]
+        for start_date, end_date in windows:
+            window = selected_window(start_date, end_date)
+            for region in self.REGIONS:
+                data = index.df if region == 'all' else index.region_series[region]
+                mask = (data['Date'] >= window[0]) & (data['Date'] <= window[1])
+                before = data[mask & (data['Date'] < PRICE_INCREASE_DATE)]['Sales']
+                after = data[mask & (data['Date'] >= PRICE_INCREASE_DATE)]['Sales']
+
+                stats = summarize_window(index.prefix_index[region], window)
+                assert stats['before_total'] == pytest.approx(before.sum())
+                assert stats['after_total'] == pytest.approx(after.sum())
+                for key, expected in (('before_avg', before.mean()), ('after_avg', after.mean())):
+                    if np.isnan(expected):
+                        assert np.isnan(stats[key]), f"{key} should be NaN for an empty side of {window}"
+                    else:
+                        assert stats[key] == pytest.approx(expected)
+                assert slice_window(data, window).index.equals(data[mask].index)
+        print("✓ Date window stats test passed")
+
+    def test_reversed_date_window_is_empty(self):
+        """Test that a start date after the end date selects nothing instead of negative totals"""
+        import numpy as np
+        from app import get_dataset, selected_window, slice_window, summarize_window, update_chart
+
+        index = get_dataset().product()
+        window = selected_window('2021-06-30', '2020-06-01')
+        for region in self.REGIONS:
+            stats = summarize_window(index.prefix_index[region], window)
+            assert stats['before_total'] == 0 and stats['after_total'] == 0, f"{region}: {stats}"
+            assert np.isnan(stats['before_avg']) and np.isnan(stats['after_avg'])
+            data = index.df if region == 'all' else index.region_series[region]
+            assert slice_window(data, window).empty
+
+        for granularity in ('daily', 'weekly', 'monthly'):
+            fig, _ = update_chart('all', None, '2021-06-30', '2020-06-01', granularity)
+            assert all(len(trace.x) == 0 for trace in fig.data), f"{granularity} chart should be empty"
+        print("✓ Reversed date window test passed")
+
+    def test_date_range_limits_plotted_dates(self):
+        """Test that the date-range picker restricts the plotted series"""
+        import pandas as pd
+        from app import update_chart
+
+        fig, _ = update_chart('all', None, '2020-06-01', '2021-06-30')
+        for trace in fig.data:
+            dates = pd.to_datetime(trace.x)
+            assert dates.min() >= pd.Timestamp('2020-06-01') and dates.max() <= pd.Timestamp('2021-06-30')
+        print("✓ Date range plotting test passed")
+
+    def test_granularity_rollups(self, monkeypatch):
+        """Test that weekly/monthly rollups are precomputed and split at the price increase"""
+        import app as app_module
+
+        index = app_module.get_dataset().product()
+        for granularity in ('weekly', 'monthly'):
+            rollups = index.rollups[granularity]
+            for region, rows in index.region_series.items():
+                assert rollups[region]['Sales'].sum() == pytest.approx(rows['Sales'].sum())
+                assert app_module.PRICE_INCREASE_DATE in set(rollups[region]['Date']), \
+                    f"{granularity} buckets for '{region}' should start again at the price increase"
+
+        # Switching granularity only reads the precomputed rollups
+        def fail(*args):
+            raise AssertionError("Rollups must not be recomputed on the request path")
+        monkeypatch.setattr(app_module, 'rollup_series', fail)
+        fig, _ = app_module.build_chart('north', granularity='monthly')
+        assert len(fig.data[0].x) == len(index.rollups['monthly']['north'])
+        assert fig.layout.title.text.startswith('Monthly'), fig.layout.title.text
+        print("✓ Granularity rollup test passed")
+
+    def test_granularity_with_date_window(self):
+        """Test that weekly/monthly buckets at the window edges only count sales inside the window"""
+        import pandas as pd
+        import app as app_module
+
+        index = app_module.get_dataset().product()
+        windows = [('2020-06-15', '2020-07-14'), ('2020-06-03', '2020-06-30'), ('2021-01-10', '2021-02-20'),
+                   ('2020-06-10', '2020-06-12'), (None, '2019-03-17'), ('2021-11-20', None)]
+        for start_date, end_date in windows:
+            window = app_module.selected_window(start_date, end_date)
+            for granularity in ('weekly', 'monthly'):
+                fig, _ = app_module.update_chart('all', None, start_date, end_date, granularity)
+                for trace in fig.data:
+                    region = trace.name.lower()
+                    rows = app_module.slice_window(index.region_series[region], window)
+                    assert sum(trace.y) == pytest.approx(rows['Sales'].sum()), \
+                        f"{granularity} {region} total differs from the window total for {window}"
+                    stats = app_module.summarize_window(index.prefix_index[region], window)
+                    assert sum(trace.y) == pytest.approx(stats['before_total'] + stats['after_total'])
+                    dates = pd.to_datetime(trace.x)
+                    assert dates.min() >= window[0] and dates.max() <= window[1], "Buckets outside the window"
+        print("✓ Granularity window test passed")
+
+    def test_products_are_indexed_separately(self):
+        """Test that every product gets its own index and chart from the processed data"""
+        import pandas as pd
+        import app as app_module
+
+        dataset = app_module.get_dataset()
+        df = pd.read_csv(app_module.DATA_PATH)
+        assert sorted(dataset.products) == sorted(df['Product'].unique())
+        assert [opt['value'] for opt in app_module.update_product_options('/')] == list(dataset.products)
+
+        index = dataset.product('gold morsel')
+        gold = df[df['Product'] == 'gold morsel']
+        assert index.region_stats['all']['before_total'] + index.region_stats['all']['after_total'] == \
+            pytest.approx(gold['Sales'].sum())
+        fig, _ = app_module.update_chart('north', product='gold morsel')
+        assert fig.layout.title.text.startswith('Daily Gold Morsel Sales'), fig.layout.title.text
+        assert app_module.update_page_title('gold morsel') == 'Gold Morsel Sales Analysis'
+        print("✓ Per-product index test passed")
+
+
+class TestFrameCache:
+    """Test suite for the on-disk Arrow cache of the prepared dataset"""
+
+    def test_cache_is_memory_mapped_on_later_loads(self, tmp_path, monkeypatch):
+        """Test that a second load reads the cache instead of parsing the CSV"""
+        pytest.importorskip('pyarrow')
+        import shutil
+        import pandas as pd
+        import app as app_module
+
+        csv_path = str(shutil.copy('data/processed_sales_data.csv', tmp_path))
+        cache_dir = str(tmp_path / 'frames')
+        prepared = app_module.load_sales_data(csv_path, cache_dir)
+        assert len(list((tmp_path / 'frames').glob('processed_sales_data-*.arrow'))) == 1
+
+        def fail(*args):
+            raise AssertionError("A cached frame must not be parsed again")
+        monkeypatch.setattr(app_module, 'prepare_sales_data', fail)
+        cached = app_module.load_sales_data(csv_path, cache_dir)
+        pd.testing.assert_frame_equal(cached, prepared)
+        assert cached['Region'].dtype == 'category', "Region should stay categorical"
+        print("✓ Frame cache hit test passed")
+
+    def test_cache_rebuilds_when_source_changes(self, tmp_path):
+        """Test that editing the CSV gives a new cache key and replaces the old cache file"""
+        pytest.importorskip('pyarrow')
+        import shutil
+        import app as app_module
+
+        csv_path = str(shutil.copy('data/processed_sales_data.csv', tmp_path))
+        cache_dir = tmp_path / 'frames'
+        app_module.load_sales_data(csv_path, str(cache_dir))
+        [old_cache] = cache_dir.glob('*.arrow')
+
+        with open(csv_path, 'a') as f:
+            f.write('1.0,2030-01-01,north,pink morsel\n')
+        reloaded = app_module.load_sales_data(csv_path, str(cache_dir))
+        assert reloaded['Date'].max() == app_module.pd.Timestamp('2030-01-01'), "Stale cache was served"
+        assert [path.name for path in cache_dir.glob('*.arrow')] != [old_cache.name]
+        assert len(list(cache_dir.glob('*.arrow'))) == 1, "Caches of the old source should be removed"
+
+        # A truncated cache file is rebuilt rather than failing the load
+        [cache_file] = cache_dir.glob('*.arrow')
+        cache_file.write_bytes(cache_file.read_bytes()[:100])
+        assert len(app_module.load_sales_data(csv_path, str(cache_dir))) == len(reloaded)
+        print("✓ Frame cache rebuild test passed")
+
+    def test_sources_with_the_same_name_keep_their_caches(self, tmp_path):
+        """Test that two sources with the same file name don't evict each other's cache"""
+        pytest.importorskip('pyarrow')
+        import shutil
+        import app as app_module
+
+        cache_dir = tmp_path / 'frames'
+        for name in ('a', 'b'):
+            (tmp_path / name).mkdir()
+            csv_path = str(shutil.copy('data/processed_sales_data.csv', tmp_path / name))
+            app_module.load_sales_data(csv_path, str(cache_dir))
+        assert len(list(cache_dir.glob('processed_sales_data-*.arrow'))) == 2
+        print("✓ Frame cache per-source test passed")
+
+
+class TestDataReload:
+    """Test suite for hot-reloading the processed data"""
+
+    def test_reload_swaps_in_new_data(self, tmp_path, monkeypatch):
+        """Test that a changed data file is swapped in and reported by the health endpoint"""
+        import os
+        import shutil
+        import app as app_module
+
+        csv_path = str(shutil.copy('data/processed_sales_data.csv', tmp_path))
+        monkeypatch.setattr(app_module, 'FRAME_CACHE_DIR', str(tmp_path / 'frames'))
+        monkeypatch.setattr(app_module, 'dataset', app_module.load_dataset(csv_path))
+        original = app_module.dataset
+
+        # Unchanged file keeps the same snapshot
+        assert app_module.reload_dataset(csv_path) is original
+
+        # Drop the last rows and bump the mtime to simulate a new ETL run
+        with open(csv_path) as f:
+            lines = f.readlines()
+        with open(csv_path, 'w') as f:
+            f.writelines(lines[:-10])
+        stat = os.stat(csv_path)
+        os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        reloaded = app_module.reload_dataset(csv_path)
+        assert reloaded is not original and reloaded.version != original.version
+        assert len(reloaded.df) == len(original.df) - 10
+        assert len(original.df) == len(lines) - 1, "Previous snapshot must not be modified"
+
+        response = app_module.app.server.test_client().get('/health')
+        assert response.status_code == 200
+        assert response.get_json()['data_version'] == reloaded.version
+        print("✓ Data reload test passed")
+
+    def test_reload_endpoint(self):
+        """Test that POST /reload reports the current data version"""
+        from app import app, get_dataset
+
+        response = app.server.test_client().post('/reload')
+        assert response.status_code == 200
+        assert response.get_json()['data_version'] == get_dataset().version
+        print("✓ Reload endpoint test passed")
+
+    def test_reload_watcher_runs_only_in_gunicorn_workers(self):
+        """Test that the preloading master starts no watcher and a forked worker gets a free lock"""
+        import os
+        import subprocess
+        import sys
+
+        if not hasattr(os, 'fork'):
+            pytest.skip('needs os.fork')
+        code = """
+import os, runpy, sys, threading
+config = runpy.run_path('gunicorn.conf.py')
+import app
+
+def watching():
+    return any(thread.name == 'sales-data-reload' for thread in threading.enumerate())
+
+assert not watching(), 'The gunicorn master should not start the reload watcher'
+app._reload_lock.acquire()
+pid = os.fork()
+if pid == 0:
+    ok = app._reload_lock.acquire(timeout=5)
+    config['post_fork'](None, None)
+    os._exit(0 if ok and watching() else 1)
+_, status = os.waitpid(pid, 0)
+sys.exit(os.waitstatus_to_exitcode(status))
+"""
+        env = dict(os.environ, SALES_DATA_RELOAD_INTERVAL='60')
+        env.pop('SALES_RELOAD_WATCHER_IN_WORKERS', None)
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        assert result.returncode == 0, result.stderr or "The worker inherited a held lock or has no watcher"
+        print("✓ Reload watcher fork test passed")
+
+
+class TestInstrumentation:
+    """Test suite for callback instrumentation and the /metrics endpoint"""
+
+    def test_metrics_endpoint_reports_phases_and_bytes(self):
+        """Test that a callback request shows up in the Prometheus metrics"""
+        import app as app_module
+
+        app_module.figure_cache.clear()
+        client = app_module.app.server.test_client()
+        # no-cache so the request is built live even if prerender.py has been run
+        response = client.post('/_dash-update-component', json=chart_callback_request('east'),
+                               headers={'Cache-Control': 'no-cache'})
+        assert response.status_code == 200
+
+        metrics = client.get('/metrics')
+        assert metrics.status_code == 200
+        assert metrics.content_type.startswith('text/plain')
+        text = metrics.get_data(as_text=True)
+        for phase in ('select', 'figure', 'summary'):
+            assert f'sales_callback_phase_seconds_count{{phase="{phase}"}}' in text, f"Missing '{phase}' phase"
+        assert 'sales_figure_cache_misses_total 1' in text
+
+        sizes = app_module.callback_metrics.histogram('sales_callback_response_bytes')
+        assert sizes is not None and sizes.sum >= len(response.data), "Response size was not recorded"
+        print("✓ Metrics endpoint test passed")
+
+    def test_response_size_is_recorded_before_compression(self, tmp_path, monkeypatch):
+        """Test that the size histogram sees serialized callback bytes, not gzip or prerendered bodies"""
+        import prerender
+        import app as app_module
+
+        client = app_module.app.server.test_client()
+        payload = chart_callback_request('south')
+        plain = client.post('/_dash-update-component', json=payload, headers={'Cache-Control': 'no-cache'})
+
+        sizes = app_module.callback_metrics.histogram('sales_callback_response_bytes')
+        before = (sizes.count, sizes.sum)
+        compressed = client.post('/_dash-update-component', json=payload,
+                                 headers={'Cache-Control': 'no-cache', 'Accept-Encoding': 'gzip'})
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert (sizes.count, sizes.sum) == (before[0] + 1, before[1] + len(plain.data))
+
+        monkeypatch.setattr(app_module, 'PRERENDER_DIR', str(tmp_path))
+        prerender.prerender(str(tmp_path))
+        before = (sizes.count, sizes.sum)
+        served = client.post('/_dash-update-component', json=payload)
+        assert 'ETag' in served.headers, "Expected a prerendered response"
+        client.post('/_dash-update-component', json=payload, headers={'If-None-Match': served.headers['ETag']})
+        assert (sizes.count, sizes.sum) == before, "Prerendered bodies and 304s should not be recorded"
+        print("✓ Uncompressed response size test passed")
+
+
+class TestBackgroundCallbacks:
+    """Test suite for running update_chart as a background callback"""
+
+    def test_build_chart_reports_progress(self):
+        """Test that every chart phase is reported to the progress callback in order"""
+        from app import build_chart, get_dataset, CHART_PHASES
+
+        reported = []
+        build_chart('east', data=get_dataset(), progress=lambda done, total: reported.append((done, total)))
+        assert reported == [(step, len(CHART_PHASES)) for step in range(1, len(CHART_PHASES) + 1)]
+        print("✓ Progress reporting test passed")
+
+    def test_background_callbacks_are_opt_in(self, tmp_path):
+        """Test that callbacks run in the request thread unless background mode is enabled"""
+        import app as app_module
+
+        assert app_module.make_background_manager(False) is None
+        callback = app_module.app.callback_map['..sales-chart.figure...summary-stats.children..']
+        assert callback['background'] is None, "update_chart should be a plain callback by default"
+
+        pytest.importorskip('diskcache')
+        manager = app_module.make_background_manager(True, str(tmp_path))
+        assert type(manager).__name__ == 'DiskcacheManager'
+        print("✓ Background opt-in test passed")
+
+    def test_background_callback_reports_progress_and_result(self, tmp_path):
+        """Test a background job end to end: progress defaults, polling and the final figure"""
+        pytest.importorskip('diskcache')
+        import json
+        import os
+        import subprocess
+        import sys
+
+        code = """
+import json, sys, time
+import app
+client = app.app.server.test_client()
+payload = json.loads(sys.argv[1])
+body = client.post('/_dash-update-component', json=payload).get_json()
+assert body['progressDefault'] == {'chart-progress.value': '0', 'chart-progress.max': '3'}, body
+assert body['cancel'] == [{'id': 'cancel-chart', 'property': 'n_clicks'}], body
+url = f"/_dash-update-component?cacheKey={body['cacheKey']}&job={body['job']}"
+for _ in range(300):
+    polled = client.post(url, json=payload).get_json()
+    if 'response' in polled:
+        break
+    time.sleep(0.05)
+assert polled['response']['sales-chart']['figure']['layout']['title']['text'].endswith('- East'), polled
+"""
+        env = dict(os.environ, SALES_BACKGROUND_CALLBACKS='1', SALES_BACKGROUND_CACHE_DIR=str(tmp_path))
+        payload = json.dumps(chart_callback_request('east'))
+        result = subprocess.run([sys.executable, '-c', code, payload], capture_output=True, text=True, env=env)
+        assert result.returncode == 0, result.stderr
+        print("✓ Background callback test passed")
+
+
+class TestHttpCaching:
+    """Test suite for response compression and conditional requests"""
+
+    def test_callback_responses_are_compressed(self):
+        """Test that callback JSON is gzip/brotli-encoded for clients that accept it"""
+        import gzip
+        import app as app_module
+
+        client = app_module.app.server.test_client()
+        payload = chart_callback_request('north')
+        headers = {'Cache-Control': 'no-cache'}
+        plain = client.post('/_dash-update-component', json=payload, headers=headers)
+        assert 'Content-Encoding' not in plain.headers, "Clients without Accept-Encoding get identity bytes"
+
+        compressed = client.post('/_dash-update-component', json=payload,
+                                 headers=dict(headers, **{'Accept-Encoding': 'gzip'}))
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in compressed.headers['Vary']
+        assert gzip.decompress(compressed.data) == plain.data
+        assert len(compressed.data) < len(plain.data) / 4, "Figure JSON should compress well"
+
+        if app_module.brotli is not None:
+            compressed = client.post('/_dash-update-component', json=payload,
+                                     headers=dict(headers, **{'Accept-Encoding': 'gzip, br'}))
+            assert compressed.headers['Content-Encoding'] == 'br'
+            assert app_module.brotli.decompress(compressed.data) == plain.data
+        print("✓ Response compression test passed")
+
+    def test_component_suites_are_compressed_once(self):
+        """Test that Dash's JavaScript bundles are compressed on the first request and reused after"""
+        import gzip
+        import app as app_module
+
+        client = app_module.app.server.test_client()
+        html = client.get('/').get_data(as_text=True)
+        path = html.split('src="')[1].split('"')[0]
+        assert path.startswith('/_dash-component-suites/')
+
+        plain = client.get(path)
+        first = client.get(path, headers={'Accept-Encoding': 'gzip'})
+        cached = len(app_module.compressed_assets)
+        repeat = client.get(path, headers={'Accept-Encoding': 'gzip'})
+        assert first.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(repeat.data) == plain.data
+        assert len(app_module.compressed_assets) == cached, "A repeat request should reuse the compressed body"
+        print("✓ Component suite compression test passed")
+
+    def test_layout_revalidates_with_etag(self):
+        """Test that a repeat layout request with a matching ETag gets a 304"""
+        from app import app as dash_app
+
+        client = dash_app.server.test_client()
+        for encoding in ('identity', 'gzip'):
+            first = client.get('/_dash-layout', headers={'Accept-Encoding': encoding})
+            etag = first.headers['ETag']
+            repeat = client.get('/_dash-layout', headers={'Accept-Encoding': encoding, 'If-None-Match': etag})
+            assert repeat.status_code == 304, f"Expected 304 for a matching {encoding} ETag"
+            assert repeat.data == b''
+        print("✓ Layout ETag test passed")
+
+    def test_chart_callback_output_id(self):
+        """Test that the prerender lookup uses the registered chart callback's output id"""
+        import app as app_module
+
+        assert app_module.CHART_CALLBACK_OUTPUT in app_module.app.callback_map
+        print("✓ Chart callback id test passed")
+
@@ -0,0 +1,47 @@
+import json
+
+import pandas as pd
+
+import benchmark
+import process_sales_data
+
+
+class TestBenchmark:
+    """Test suite for the ETL and callback benchmark"""
+
+    def test_synthetic_data_matches_raw_schema(self, tmp_path):
+        """Test that generated inputs have the raw file layout and go through the ETL"""
+        files = benchmark.generate_raw_data(tmp_path, rows=1000, shards=2)
+        expected_header = pd.read_csv(process_sales_data.DATA_FILES[0], nrows=0).columns.tolist()
+
+        assert sum(len(pd.read_csv(file)) for file in files) == 1000
+        assert pd.read_csv(files[0], nrows=0).columns.tolist() == expected_header
+        rows = process_sales_data.process_in_memory(files, tmp_path / 'processed.csv')
+        assert rows > 0, "Synthetic data should produce processed rows"
+        print("✓ Synthetic data test passed")
+
+    def test_benchmark_writes_comparable_results(self, tmp_path):
+        """Test a tiny end-to-end benchmark run and a comparison against its own baseline"""
+        results_path = tmp_path / 'results.json'
+        args = ['--rows', '2000', '--repeat', '2', '--etl-modes', 'streaming', '--gunicorn-workers', '0',
+                '--data-dir', str(tmp_path)]
+        benchmark.main(args + ['--save', str(results_path)])
+
+        results = json.loads(results_path.read_text())
+        assert results['etl']['streaming']['peak_rss_mb'] > 0
+        assert results['etl']['streaming']['identical_output']
+        assert set(results['callbacks']) == set(benchmark.REGION_VALUES)
+        assert results['callbacks']['all']['uncached']['p99_ms'] >= results['callbacks']['all']['uncached']['p50_ms']
+        assert benchmark.compare_to_baseline(results, results_path) == []
+        print("✓ Benchmark run test passed")
+
+    def test_process_memory_reports_uss_and_pss(self):
+        """Test the per-process memory figures used for the gunicorn preload comparison"""
+        import os
+
+        memory = benchmark.process_memory_mb(os.getpid())
+        assert memory['uss_mb'] > 0
+        if memory['pss_mb'] is not None:
+            # PSS counts shared pages fractionally, so it is at least the unique memory
+            assert memory['pss_mb'] >= memory['uss_mb']
+        print("✓ Process memory test passed")
@@ -0,0 +1,35 @@
+import json
+
+import loadtest
+
+
+class TestLoadTest:
+    """Test suite for the callback endpoint load test"""
+
+    def test_payload_matches_registered_callback(self):
+        """Test that the simulated requests send every input of the chart callback"""
+        from app import app, chart_callback_request
+
+        callback = app.callback_map[chart_callback_request('all')['output']]
+        expected = [(item['id'], item['property']) for item in callback['inputs']]
+        for region in loadtest.REGION_MIX:
+            payload = chart_callback_request(region, '2020-06-01', '2021-06-30')
+            assert [(item['id'], item['property']) for item in payload['inputs']] == expected
+        assert sum(loadtest.REGION_MIX.values()) == 1.0
+        print("✓ Load test payload test passed")
+
+    def test_load_test_reports_throughput_and_latency(self, tmp_path):
+        """Test a short load run against a locally started server"""
+        results_path = tmp_path / 'loadtest.json'
+        exit_code = loadtest.main(['--workers', '1', '--threads', '2', '--clients', '4', '--duration', '1',
+                                   '--warmup', '0', '--vary-dates', '--save', str(results_path)])
+
+        saved = json.loads(results_path.read_text())
+        assert saved['prerendered'] is False, "Load runs should bypass prerendered responses by default"
+        [run] = saved['runs']
+        assert exit_code == 0, f"Load test saw {run['errors']} failed requests"
+        assert (run['workers'], run['threads'], run['clients']) == (1, 2, 4)
+        assert run['requests'] > 0 and run['requests_per_sec'] > 0
+        assert run['p50_ms'] <= run['p90_ms'] <= run['p99_ms'] <= run['max_ms']
+        assert run['error_rate'] == 0.0
+        print("✓ Load test run test passed")
@@ -0,0 +1,35 @@
+import pytest
+from metrics import Histogram, MetricsRegistry
+
+
+class TestMetrics:
+    """Test suite for the Prometheus-style metrics registry"""
+
+    def test_histogram_buckets_are_inclusive_upper_bounds(self):
+        """Test that observations land in the first bucket whose bound is >= the value"""
+        histogram = Histogram((1, 5, 10))
+        for value in (0.5, 1, 3, 10, 11):
+            histogram.observe(value)
+
+        assert histogram.counts == [2, 1, 1, 1]
+        assert histogram.count == 5
+        assert histogram.sum == pytest.approx(25.5)
+        print("✓ Histogram bucket test passed")
+
+    def test_render_uses_cumulative_buckets(self):
+        """Test the exposition text for histograms, counters and scrape-time samples"""
+        registry = MetricsRegistry()
+        registry.describe('request_seconds', 'histogram', 'Request time')
+        registry.observe('request_seconds', 0.2, (0.1, 1.0), route='chart')
+        registry.observe('request_seconds', 0.05, (0.1, 1.0), route='chart')
+        registry.inc('errors_total', route='chart')
+
+        text = registry.render([('rows', 'gauge', 'Loaded rows', 42)])
+        assert '# TYPE request_seconds histogram' in text
+        assert 'request_seconds_bucket{route="chart",le="0.1"} 1' in text
+        assert 'request_seconds_bucket{route="chart",le="1.0"} 2' in text
+        assert 'request_seconds_bucket{route="chart",le="+Inf"} 2' in text
+        assert 'request_seconds_count{route="chart"} 2' in text
+        assert 'errors_total{route="chart"} 1' in text
+        assert '# TYPE rows gauge\nrows 42' in text
+        print("✓ Metrics rendering test passed")
@@ -0,0 +1,101 @@
+import gzip
+import json
+
+import pytest
+
+import app as app_module
+import prerender
+
+
+@pytest.fixture
+def prerendered(tmp_path, monkeypatch):
+    """Prerender into a temporary directory and point the app at it"""
+    monkeypatch.setattr(app_module, 'PRERENDER_DIR', str(tmp_path))
+    return prerender.prerender(str(tmp_path))
+
+
+class TestPrerender:
+    """Test suite for prerendered chart responses"""
+
+    def test_prerendered_bodies_match_live_responses(self, prerendered):
+        """Test that every region is prerendered byte-identical to the live callback response"""
+        client = app_module.app.server.test_client()
+        assert set(prerendered['regions']) == {'all', 'north', 'south', 'east', 'west'}
+        assert prerendered['data_version'] == app_module.get_dataset().version
+
+        for region, entry in prerendered['regions'].items():
+            payload = app_module.chart_callback_request(region)
+            live = client.post('/_dash-update-component', json=payload, headers={'Cache-Control': 'no-cache'})
+            served = client.post('/_dash-update-component', json=payload, headers={'Accept-Encoding': 'gzip'})
+            assert served.headers['ETag'] == f'"{entry["etag"]}-gzip"', "Expected the prerendered gzip copy"
+            assert gzip.decompress(served.data) == live.data, f"Prerendered '{region}' differs from live"
+        print("✓ Prerendered body test passed")
+
+    def test_repeat_requests_get_304(self, prerendered):
+        """Test ETag revalidation and browser-style requests that omit unset input values"""
+        client = app_module.app.server.test_client()
+        payload = app_module.chart_callback_request('east')
+        # The browser sends no value for inputs that were never set
+        for item in payload['inputs']:
+            if item['value'] is None:
+                del item['value']
+
+        first = client.post('/_dash-update-component', json=payload)
+        assert first.headers['ETag'] == f'"{prerendered["regions"]["east"]["etag"]}"'
+        repeat = client.post('/_dash-update-component', json=payload, headers={'If-None-Match': first.headers['ETag']})
+        assert repeat.status_code == 304
+        assert 'sales_prerendered_responses_total{encoding="identity",status="304"}' in \
+            client.get('/metrics').get_data(as_text=True)
+
+        # Any other selection is still computed live
+        payload['inputs'][-1]['value'] = 'gold morsel'
+        assert 'ETag' not in client.post('/_dash-update-component', json=payload).headers
+        print("✓ Prerendered 304 test passed")
+
+    def test_relayout_without_zoom_uses_prerender(self, prerendered):
+        """Test that relayoutData left by the graph's first render still matches, but a zoom does not"""
+        client = app_module.app.server.test_client()
+        payload = app_module.chart_callback_request('west')
+        relayout = next(item for item in payload['inputs'] if item['id'] == 'sales-chart')
+        relayout['value'] = {'autosize': True}
+        response = client.post('/_dash-update-component', json=payload)
+        assert response.headers['ETag'] == f'"{prerendered["regions"]["west"]["etag"]}"'
+
+        relayout['value'] = {'xaxis.range[0]': '2020-01-01', 'xaxis.range[1]': '2020-06-30'}
+        assert 'ETag' not in client.post('/_dash-update-component', json=payload).headers
+
+        # A non-zoom relayout raised by the graph itself is skipped by the live callback too
+        relayout['value'] = {'dragmode': 'pan'}
+        payload['changedPropIds'] = ['sales-chart.relayoutData']
+        assert client.post('/_dash-update-component', json=payload).status_code == 204
+        print("✓ Prerendered relayout test passed")
+
+    def test_rerun_only_removes_its_own_files(self, prerendered, tmp_path):
+        """Test that a rerun deletes stale bodies but leaves other files in a shared directory alone"""
+        stale = tmp_path / 'east-0123456789abcdef.json.gz'
+        stale.write_bytes(b'old body')
+        foreign = [tmp_path / 'daily_sales_data_9.csv', tmp_path / 'notes.txt', tmp_path / 'east-notes.json']
+        for path in foreign:
+            path.write_text('keep me')
+
+        manifest = prerender.prerender(str(tmp_path))
+        assert not stale.exists(), "A body left by an earlier run should be removed"
+        assert all(path.read_text() == 'keep me' for path in foreign), "Unrelated files were deleted"
+        for entry in manifest['regions'].values():
+            assert all((tmp_path / name).exists() for name in entry['files'].values())
+        print("✓ Prerender cleanup test passed")
+
+    @pytest.mark.parametrize('key', ['data_version', 'render_version'])
+    def test_stale_prerender_is_ignored(self, prerendered, tmp_path, key):
+        """Test that output rendered from another data version or by other code is not served"""
+        manifest_path = tmp_path / 'manifest.json'
+        manifest = json.loads(manifest_path.read_text())
+        assert manifest['render_version'] == app_module.RENDER_VERSION
+        manifest[key] = 'older'
+        manifest_path.write_text(json.dumps(manifest))
+
+        client = app_module.app.server.test_client()
+        response = client.post('/_dash-update-component', json=app_module.chart_callback_request('east'))
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers, f"A prerendered response with an old {key} was served"
+        print("✓ Stale prerender test passed")
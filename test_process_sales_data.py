@@ -0,0 +1,233 @@
+import pytest
+import process_sales_data
+
+
+class TestProcessSalesData:
+    """Test suite for the sales ETL"""
+
+    def test_streaming_matches_in_memory(self, tmp_path):
+        """Test that chunked streaming output is byte-identical to the in-memory output"""
+        in_memory_path = tmp_path / 'in_memory.csv'
+        streaming_path = tmp_path / 'streaming.csv'
+
+        rows_in_memory = process_sales_data.process_in_memory(process_sales_data.DATA_FILES, in_memory_path)
+        # Small chunks so every file is split several times
+        rows_streaming = process_sales_data.process_streaming(process_sales_data.DATA_FILES, streaming_path, chunksize=1000)
+
+        assert rows_in_memory == rows_streaming, "Row counts differ between in-memory and streaming modes"
+        assert in_memory_path.read_bytes() == streaming_path.read_bytes(), "Streaming output is not byte-identical"
+        print("✓ Streaming output test passed")
+
+    def test_output_matches_committed_data(self, tmp_path):
+        """Test that the ETL reproduces the committed processed_sales_data.csv"""
+        output_path = tmp_path / 'processed.csv'
+        process_sales_data.main(['--stream', '--output', str(output_path)])
+
+        with open(process_sales_data.OUTPUT_PATH, 'rb') as f:
+            expected = f.read()
+        assert output_path.read_bytes() == expected, "ETL output differs from committed processed data"
+        print("✓ Committed output test passed")
+
+    def test_parallel_matches_serial(self, tmp_path):
+        """Test that process-pool ingestion writes the same output as the serial path"""
+        serial_path = tmp_path / 'serial.csv'
+        parallel_path = tmp_path / 'parallel.csv'
+
+        process_sales_data.process_in_memory(process_sales_data.DATA_FILES, serial_path)
+        process_sales_data.process_parallel(process_sales_data.DATA_FILES, parallel_path, workers=2)
+
+        assert serial_path.read_bytes() == parallel_path.read_bytes(), "Parallel output differs from serial output"
+        print("✓ Parallel ingestion test passed")
+
+    def test_incremental_reprocesses_only_changed_files(self, tmp_path):
+        """Test that incremental runs splice added, changed and removed files correctly"""
+        import shutil
+
+        shards = []
+        for file in process_sales_data.DATA_FILES:
+            shards.append(str(shutil.copy(file, tmp_path)))
+        output_path = str(tmp_path / 'processed.csv')
+        expected_path = tmp_path / 'expected.csv'
+
+        # First run builds everything
+        _, reprocessed = process_sales_data.process_incremental(shards[:2], output_path)
+        assert reprocessed == shards[:2]
+
+        # Adding a file only parses the new one
+        _, reprocessed = process_sales_data.process_incremental(shards, output_path)
+        assert reprocessed == [shards[2]], f"Expected only the new file to be parsed, got {reprocessed}"
+        process_sales_data.process_in_memory(shards, expected_path)
+        assert (tmp_path / 'processed.csv').read_bytes() == expected_path.read_bytes()
+
+        # Changing a file only parses that file
+        with open(shards[1], 'a') as f:
+            f.write('pink morsel,$5.00,10,2020-01-01,north\n')
+        _, reprocessed = process_sales_data.process_incremental(shards, output_path)
+        assert reprocessed == [shards[1]], f"Expected only the changed file to be parsed, got {reprocessed}"
+        process_sales_data.process_in_memory(shards, expected_path)
+        assert (tmp_path / 'processed.csv').read_bytes() == expected_path.read_bytes()
+
+        # Removing a file drops its rows without parsing anything
+        _, reprocessed = process_sales_data.process_incremental([shards[0], shards[2]], output_path)
+        assert reprocessed == []
+        process_sales_data.process_in_memory([shards[0], shards[2]], expected_path)
+        assert (tmp_path / 'processed.csv').read_bytes() == expected_path.read_bytes()
+        print("✓ Incremental ETL test passed")
+
+    def test_incremental_rebuilds_output_with_old_columns(self, tmp_path):
+        """Test that an output and manifest written before the Product column are rebuilt, not spliced"""
+        import json
+        import os
+        import pandas as pd
+
+        output_path = tmp_path / 'processed.csv'
+        manifest_path = process_sales_data.manifest_path_for(str(output_path))
+
+        # Output as the pink-only ETL wrote it: Sales,Date,Region and a manifest without a schema
+        header = b'Sales,Date,Region\n'
+        shards = []
+        with open(output_path, 'wb') as out:
+            out.write(header)
+            for file in process_sales_data.DATA_FILES:
+                df = pd.read_csv(file)
+                df = df[df['product'] == 'pink morsel']
+                block = pd.DataFrame({
+                    'Sales': df['price'].str.replace('$', '', regex=False).astype(float) * df['quantity'],
+                    'Date': df['date'], 'Region': df['region']
+                }).to_csv(index=False, header=False).encode()
+                out.write(block)
+                stat = os.stat(file)
+                shards.append({'path': file, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                               'sha256': process_sales_data.file_sha256(file), 'rows': len(df),
+                               'bytes': len(block)})
+        stat = os.stat(output_path)
+        with open(manifest_path, 'w') as f:
+            json.dump({'output_size': stat.st_size, 'output_mtime_ns': stat.st_mtime_ns,
+                       'header_bytes': len(header), 'shards': shards}, f)
+
+        _, reprocessed = process_sales_data.process_incremental(process_sales_data.DATA_FILES, str(output_path))
+        assert reprocessed == process_sales_data.DATA_FILES, "An old-schema output must be fully rebuilt"
+        expected_path = tmp_path / 'expected.csv'
+        process_sales_data.process_in_memory(process_sales_data.DATA_FILES, expected_path)
+        assert output_path.read_bytes() == expected_path.read_bytes()
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        assert manifest['columns'] == process_sales_data.OUTPUT_COLUMNS
+        print("✓ Incremental schema upgrade test passed")
+
+    @pytest.mark.parametrize('fmt', process_sales_data.COLUMNAR_FORMATS)
+    def test_columnar_copy_is_typed(self, tmp_path, fmt):
+        """Test that the columnar copy stores native datetime, categorical and float columns"""
+        pytest.importorskip('pyarrow')
+        import pandas as pd
+
+        output_path = str(tmp_path / 'processed.csv')
+        process_sales_data.process_in_memory(process_sales_data.DATA_FILES, output_path)
+        columnar_path = process_sales_data.write_columnar(output_path, fmt)
+
+        df = pd.read_parquet(columnar_path) if fmt == 'parquet' else pd.read_feather(columnar_path)
+        assert str(df['Date'].dtype).startswith('datetime64'), f"Date stored as {df['Date'].dtype}"
+        assert isinstance(df['Region'].dtype, pd.CategoricalDtype), f"Region stored as {df['Region'].dtype}"
+        assert df['Sales'].dtype == 'float64', f"Sales stored as {df['Sales'].dtype}"
+        assert len(df) == len(pd.read_csv(output_path))
+        print("✓ Columnar output test passed")
+
+    @pytest.mark.parametrize('fmt', process_sales_data.COLUMNAR_FORMATS)
+    def test_columnar_copy_is_written_in_batches(self, tmp_path, fmt):
+        """Test that a batched columnar copy matches the CSV when categories first appear in later batches"""
+        pytest.importorskip('pyarrow')
+        import pandas as pd
+
+        output_path = tmp_path / 'processed.csv'
+        rows = ['1.5,2021-01-14,north,pink morsel'] * 2000 + [',2021-01-15,west,gold morsel'] * 2000 + \
+               ['3.0,2021-01-16,north,pink morsel', '4.0,2021-01-16,south,']
+        output_path.write_text('Sales,Date,Region,Product\n' + '\n'.join(rows) + '\n')
+        columnar_path = process_sales_data.write_columnar(str(output_path), fmt, block_size=4096)
+
+        df = pd.read_parquet(columnar_path) if fmt == 'parquet' else pd.read_feather(columnar_path)
+        expected = pd.read_csv(output_path, dtype={'Sales': 'float64', 'Region': 'category', 'Product': 'category'},
+                               parse_dates=['Date'], float_precision='round_trip')
+        assert isinstance(df['Product'].dtype, pd.CategoricalDtype), f"Product stored as {df['Product'].dtype}"
+        pd.testing.assert_frame_equal(df.astype({'Region': object, 'Product': object}),
+                                      expected.astype({'Region': object, 'Product': object}), check_exact=True)
+        print("✓ Batched columnar output test passed")
+
+    def test_fast_parse_matches_string_parsing(self):
+        """Test that category-based filtering and price parsing match plain string operations"""
+        import pandas as pd
+
+        raw = pd.DataFrame({
+            'product': ['Pink Morsel', 'gold morsel', 'pink morsel', None, 'PINK MORSEL'],
+            'price': ['$3.00', '$9.99', '$5.00', '$1.00', None],
+            'quantity': [10, 20, 30, 40, 50],
+            'date': ['2021-01-14', '2021-01-14', '2021-01-15', '2021-01-15', '2021-01-16'],
+            'region': ['north', 'south', 'east', 'west', 'north']
+        })
+        result = process_sales_data.transform(raw)
+
+        assert result.columns.tolist() == process_sales_data.OUTPUT_COLUMNS
+        assert result['Product'].tolist() == ['pink morsel', 'gold morsel', 'pink morsel', 'pink morsel']
+        assert result['Date'].tolist() == ['2021-01-14', '2021-01-14', '2021-01-15', '2021-01-16']
+        assert result['Sales'].tolist()[:3] == pytest.approx([30.0, 199.8, 150.0])
+        assert pd.isna(result['Sales'].iloc[3]), "Missing price should give a missing Sales value"
+        print("✓ Fast parse test passed")
+
+    def test_inputs_are_discovered_by_glob(self, tmp_path):
+        """Test that raw files are found by glob and ordered numerically"""
+        for shard in (10, 2, 0):
+            (tmp_path / f'daily_sales_data_{shard}.csv').write_text('product,price,quantity,date,region\n')
+        (tmp_path / 'other.csv').write_text('')
+
+        found = process_sales_data.discover_data_files(str(tmp_path / 'daily_sales_data_*.csv'))
+        assert [path.rsplit('_', 1)[-1] for path in found] == ['0.csv', '2.csv', '10.csv']
+        assert process_sales_data.DATA_FILES == ['data/daily_sales_data_0.csv', 'data/daily_sales_data_1.csv',
+                                                 'data/daily_sales_data_2.csv']
+        print("✓ Input discovery test passed")
+
+    def test_engines_are_imported_on_use(self):
+        """Test that importing the ETL (as app.py does) doesn't import polars or duckdb"""
+        import subprocess
+        import sys
+
+        code = 'import sys, process_sales_data; assert not {"polars", "duckdb"} & set(sys.modules), sys.modules.keys()'
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        print("✓ Lazy engine import test passed")
+
+    def test_out_of_core_engines_match_pandas(self, tmp_path):
+        """Test that the polars and duckdb engines write the same bytes as the pandas engine"""
+        engines = [engine for engine in ('polars', 'duckdb') if process_sales_data.engine_installed(engine)]
+        if not engines:
+            pytest.skip('neither polars nor duckdb is installed')
+
+        # Real inputs plus a file with a missing price, a missing product and mixed-case names
+        edge_path = tmp_path / 'daily_sales_data_3.csv'
+        edge_path.write_text('product,price,quantity,date,region\n'
+                             'Gold Morsel,,5,2022-02-14,north\n'
+                             ',$1.00,3,2022-02-14,south\n'
+                             'PINK MORSEL,$5.00,7,2022-02-14,east\n')
+        data_files = process_sales_data.DATA_FILES + [str(edge_path)]
+        expected_rows = process_sales_data.process_in_memory(data_files, tmp_path / 'pandas.csv')
+
+        for engine in engines:
+            output_path = tmp_path / f'{engine}.csv'
+            rows = process_sales_data.process_with_engine(engine, data_files, output_path)
+            assert rows == expected_rows, f"{engine} reported {rows} rows, pandas wrote {expected_rows}"
+            assert output_path.read_bytes() == (tmp_path / 'pandas.csv').read_bytes(), \
+                f"{engine} output differs from the pandas engine"
+
+            # No inputs still gives a header-only file
+            empty_path = tmp_path / f'{engine}_empty.csv'
+            assert process_sales_data.process_with_engine(engine, [], empty_path) == 0
+            assert empty_path.read_text().strip() == ','.join(process_sales_data.OUTPUT_COLUMNS)
+        print("✓ Out-of-core engine test passed")
+
+    def test_profile_flag_writes_artifact(self, tmp_path):
+        """Test that --profile writes a pstats file to --profile-dir"""
+        profile_dir = tmp_path / 'profiles'
+        process_sales_data.main(['--output', str(tmp_path / 'processed.csv'),
+                                 '--profile', '--profile-dir', str(profile_dir)])
+
+        assert len(list(profile_dir.glob('etl-*.pstats'))) == 1, "Expected one ETL profile artifact"
+        print("✓ ETL profiling test passed")
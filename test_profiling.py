@@ -0,0 +1,49 @@
+import pstats
+
+import pytest
+from flask import Flask
+
+from profiling import RunProfiler, install_request_profiler
+
+
+class TestProfiling:
+    """Test suite for the opt-in profiling hooks"""
+
+    def test_run_profiler_writes_pstats(self, tmp_path):
+        """Test that a profiled block produces a loadable pstats file"""
+        with RunProfiler('unit', str(tmp_path)) as profiler:
+            sum(i * i for i in range(10000))
+
+        assert profiler.path is not None and profiler.path.endswith('.pstats')
+        assert pstats.Stats(profiler.path).total_calls > 0
+        print("✓ Run profiler test passed")
+
+    @pytest.mark.parametrize('rate, expected', [(1.0, 3), (0.0, 0)])
+    def test_request_profiler_samples_matching_requests(self, tmp_path, rate, expected):
+        """Test that sampled requests write one artifact each and other routes are skipped"""
+        server = Flask(__name__)
+        server.add_url_rule('/_dash-update-component', 'update', lambda: 'ok', methods=['POST'])
+        server.add_url_rule('/health', 'health', lambda: 'ok')
+        install_request_profiler(server, rate, str(tmp_path))
+
+        client = server.test_client()
+        for _ in range(3):
+            assert client.post('/_dash-update-component').status_code == 200
+        client.get('/health')
+
+        assert len(list(tmp_path.glob('*.pstats'))) == expected
+        print("✓ Request profiler test passed")
+
+    def test_request_profiler_checks_format_at_install(self, monkeypatch):
+        """Test that an unusable format is rejected when the hook is installed, not per request"""
+        import profiling
+
+        server = Flask(__name__)
+        with pytest.raises(ValueError):
+            install_request_profiler(server, 1.0, fmt='svg')
+
+        monkeypatch.setattr(profiling, 'SamplingProfiler', None)
+        with pytest.raises(RuntimeError, match='pyinstrument'):
+            install_request_profiler(server, 1.0, fmt='html')
+        assert not server.before_request_funcs
+        print("✓ Profile format check test passed")